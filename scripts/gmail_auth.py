@@ -40,6 +40,12 @@ TOKEN_FILE = os.path.join(os.path.dirname(__file__), "token.json")
 def main():
     creds = None
 
+    # Read the client config once; it's needed for the consent flow and the printout
+    client_config = None
+    if os.path.exists(CREDENTIALS_FILE):
+        with open(CREDENTIALS_FILE) as f:
+            client_config = json.load(f)
+
     if os.path.exists(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
 
@@ -48,15 +54,16 @@ def main():
             print("Refreshing expired token...")
             creds.refresh(Request())
         else:
-            if not os.path.exists(CREDENTIALS_FILE):
+            if client_config is None:
                 print(f"ERROR: {CREDENTIALS_FILE} not found.")
                 print("Download it from Google Cloud Console → APIs → Credentials → OAuth 2.0 Client IDs")
                 sys.exit(1)
 
             print("Opening browser for OAuth consent...")
-            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
+            flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
             creds = flow.run_local_server(port=0)
 
+        # Written for local dev convenience; the printout below uses creds directly
         with open(TOKEN_FILE, "w") as f:
             f.write(creds.to_json())
         print(f"Token saved to {TOKEN_FILE}")
@@ -66,13 +73,12 @@ def main():
     print("Copy these into your Railway environment variables:")
     print("=" * 60)
 
-    with open(CREDENTIALS_FILE) as f:
-        creds_json = f.read().strip()
-    print(f"\nGMAIL_CREDENTIALS_JSON={creds_json}")
+    if client_config is not None:
+        print(f"\nGMAIL_CREDENTIALS_JSON={json.dumps(client_config)}")
+    else:
+        print(f"\nGMAIL_CREDENTIALS_JSON not printed — {CREDENTIALS_FILE} not found")
 
-    with open(TOKEN_FILE) as f:
-        token_json = f.read().strip()
-    print(f"\nGMAIL_TOKEN_JSON={token_json}")
+    print(f"\nGMAIL_TOKEN_JSON={creds.to_json()}")
 
     print("\n" + "=" * 60)
     print("Done. You can now deploy to Railway with these env vars.")
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
 from contextlib import asynccontextmanager
 from datetime import datetime
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, ORJSONResponse
 
 from assistant.config import load_config
 from assistant.models import LinkedInDraftRequest
@@ -22,6 +26,9 @@ from assistant.voice.feedback import VoiceFeedbackProcessor
 from assistant.voice.profile import VoiceProfileManager
 
 logger = logging.getLogger(__name__)
+
+# How long shutdown waits for an in-flight voice bootstrap before closing the db
+BOOTSTRAP_SHUTDOWN_TIMEOUT_SECONDS = 30
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(name)s %(levelname)s %(message)s",
@@ -42,24 +49,23 @@ async def lifespan(app: FastAPI):
     gmail_client = GmailClient(config, db)
     notifier = SlackNotifier(config)
     draft_store = DraftStore(db)
-    draft_generator = DraftGenerator(config, db)
     feedback_processor = VoiceFeedbackProcessor(db)
-    email_classifier = EmailClassifier(config)
+    draft_generator = DraftGenerator(config, db, feedback_processor)
+    email_classifier = EmailClassifier(config, db)
     voice_manager = VoiceProfileManager(db)
 
-    # Bootstrap voice profile if not yet done
+    # Bootstrap voice profile if not yet done — in the background, so the server
+    # starts accepting traffic without waiting on Gmail + Claude
+    bootstrap_task = None
+    bootstrap_stop = threading.Event()
     if voice_manager.get_profile() is None:
         logger.info("No voice profile found — bootstrapping from sent emails...")
-        try:
-            analyzer = VoiceAnalyzer(config, db)
-            sent_emails = gmail_client.get_sent_emails(max_results=100)
-            if sent_emails:
-                analyzer.analyze_emails(sent_emails)
-                logger.info("Voice profile bootstrapped from %d sent emails", len(sent_emails))
-            else:
-                logger.warning("No sent emails found for voice bootstrap")
-        except Exception:
-            logger.exception("Voice bootstrap failed — will use defaults")
+        bootstrap_task = asyncio.create_task(
+            asyncio.to_thread(
+                _bootstrap_voice_profile, config, db, gmail_client, draft_generator, bootstrap_stop
+            )
+        )
+    app.state.voice_bootstrap_task = bootstrap_task
 
     # Email scanner (APScheduler)
     email_scanner = EmailScanner(
@@ -71,7 +77,8 @@ async def lifespan(app: FastAPI):
         notifier=notifier,
         db=db,
     )
-    scheduler = BackgroundScheduler()
+    # Shares the app's event loop; sync jobs still run in the loop's default executor
+    scheduler = AsyncIOScheduler(event_loop=asyncio.get_running_loop())
     scheduler.add_job(
         email_scanner.scan,
         "interval",
@@ -86,7 +93,15 @@ async def lifespan(app: FastAPI):
         "cron",
         hour=3,  # 3 AM daily
         id="voice_update",
-        args=[config, db, gmail_client, voice_manager],
+        args=[config, db, gmail_client, voice_manager, draft_generator],
+    )
+
+    # Keep the Gmail OAuth token fresh outside the scan/send path
+    scheduler.add_job(
+        gmail_client.refresh_if_near_expiry,
+        "interval",
+        minutes=10,
+        id="gmail_refresh",
     )
 
     scheduler.start()
@@ -112,43 +127,104 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    if bootstrap_task and not bootstrap_task.done():
+        # Cancelling the task wouldn't stop its thread; ask it to stop and give it
+        # a moment to finish before the db is closed under it
+        bootstrap_stop.set()
+        try:
+            await asyncio.wait_for(bootstrap_task, BOOTSTRAP_SHUTDOWN_TIMEOUT_SECONDS)
+        except TimeoutError:
+            logger.warning("Voice bootstrap still running at shutdown — closing anyway")
     scheduler.shutdown(wait=False)
+    notifier.close()
+    draft_generator.close()
+    feedback_processor.flush()
     db.close()
     logger.info("Assistant shut down")
 
 
+def _bootstrap_voice_profile(
+    config,
+    db,
+    gmail_client: GmailClient,
+    draft_generator: DraftGenerator,
+    stop: threading.Event,
+):
+    """One-off job to build the initial voice profile from sent emails.
+    Gives up without writing anything once `stop` is set (app shutdown)."""
+    try:
+        analyzer = VoiceAnalyzer(config, db)
+        sent_emails = gmail_client.get_sent_emails(max_results=100)
+        if stop.is_set():
+            logger.info("Voice bootstrap stopped for shutdown")
+            return
+        if sent_emails:
+            analyzer.analyze_emails(sent_emails, stop=stop)
+            draft_generator.invalidate_caches()
+            logger.info("Voice profile bootstrapped from %d sent emails", len(sent_emails))
+        else:
+            logger.warning("No sent emails found for voice bootstrap")
+    except Exception:
+        logger.exception("Voice bootstrap failed — will use defaults")
+
+
 def _update_voice_profile(
-    config, db, gmail_client: GmailClient, voice_manager: VoiceProfileManager
+    config,
+    db,
+    gmail_client: GmailClient,
+    voice_manager: VoiceProfileManager,
+    draft_generator: DraftGenerator,
 ):
     """Daily job to update voice profile from recent sent emails."""
     try:
         analyzer = VoiceAnalyzer(config, db)
         sent_emails = gmail_client.get_sent_emails(max_results=50)
         if sent_emails:
-            analyzer.analyze_emails(sent_emails)
+            # Nobody is waiting on the daily refresh, so take the cheaper batch path
+            analyzer.analyze_emails(sent_emails, use_batch=True)
+            draft_generator.invalidate_caches()
             logger.info("Voice profile updated from %d sent emails", len(sent_emails))
     except Exception:
         logger.exception("Voice profile update failed")
 
 
-app = FastAPI(title="Personal Assistant Agent", lifespan=lifespan)
+app = FastAPI(
+    title="Personal Assistant Agent",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+if load_config().profile:
+    # Dev-only: append ?profile=1 to any request to get a pyinstrument flame graph
+    from pyinstrument import Profiler
+
+    @app.middleware("http")
+    async def _profile_request(request: Request, call_next):
+        if not request.query_params.get("profile"):
+            return await call_next(request)
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
 
 
 @app.get("/health")
 def health():
     return {
         "status": "ok",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
     }
 
 
 @app.post("/api/linkedin/draft")
-def linkedin_draft(req: Request, body: LinkedInDraftRequest, authorization: str = Header()):
+async def linkedin_draft(req: Request, body: LinkedInDraftRequest, authorization: str = Header()):
     """Generate a draft response for a LinkedIn DM. Called by the Chrome extension."""
     # Auth check
     expected = f"Bearer {req.app.state.config.api_secret}"
     if not req.app.state.config.api_secret or authorization != expected:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
+    # The Anthropic SDK client is blocking — run it off the event loop
     generator: DraftGenerator = req.app.state.draft_generator
-    return generator.generate_linkedin_draft(body)
+    return await run_in_threadpool(generator.generate_linkedin_draft, body)
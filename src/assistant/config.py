@@ -1,14 +1,17 @@
 from __future__ import annotations
 
-import os
+from functools import lru_cache
+from typing import Annotated
 
-from dotenv import load_dotenv
-from pydantic import BaseModel, field_validator
+from pydantic import field_validator
+from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 
-load_dotenv()
 
+class Config(BaseSettings):
+    """App settings, read from env vars (or .env) matching the field names."""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
-class Config(BaseModel):
     # Claude
     anthropic_api_key: str
     model: str = "claude-sonnet-4-20250514"
@@ -24,15 +27,22 @@ class Config(BaseModel):
     slack_user_id: str
 
     # Monitoring
-    slack_channel_ids: list[str] = []
+    slack_channel_ids: Annotated[list[str], NoDecode] = []
     email_scan_interval_minutes: int = 5
 
+    # Anthropic tier limits for client-side rate limiting
+    anthropic_rpm: int = 50
+    anthropic_tpm: int = 80000
+
     # API auth
     api_secret: str = ""
 
     # Database
     db_path: str = "data/assistant.db"
 
+    # Dev-only request profiling (needs the "profile" extra)
+    profile: bool = False
+
     @field_validator("slack_channel_ids", mode="before")
     @classmethod
     def parse_channel_ids(cls, v: str | list[str]) -> list[str]:
@@ -41,20 +51,6 @@ class Config(BaseModel):
         return v
 
 
+@lru_cache
 def load_config() -> Config:
-    return Config(
-        anthropic_api_key=os.environ["ANTHROPIC_API_KEY"],
-        model=os.environ.get("MODEL", "claude-sonnet-4-20250514"),
-        gmail_credentials_json=os.environ["GMAIL_CREDENTIALS_JSON"],
-        gmail_token_json=os.environ["GMAIL_TOKEN_JSON"],
-        gmail_user_email=os.environ["GMAIL_USER_EMAIL"],
-        slack_bot_token=os.environ["SLACK_BOT_TOKEN"],
-        slack_app_token=os.environ["SLACK_APP_TOKEN"],
-        slack_user_id=os.environ["SLACK_USER_ID"],
-        slack_channel_ids=os.environ.get("SLACK_CHANNEL_IDS", ""),
-        email_scan_interval_minutes=int(
-            os.environ.get("EMAIL_SCAN_INTERVAL_MINUTES", "5")
-        ),
-        api_secret=os.environ.get("API_SECRET", ""),
-        db_path=os.environ.get("DB_PATH", "data/assistant.db"),
-    )
+    return Config()
@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import os
 import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Iterable
 
 
 SCHEMA = """
@@ -71,20 +74,113 @@ CREATE TABLE IF NOT EXISTS voice_examples (
     tone_tags TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE TABLE IF NOT EXISTS classification_cache (
+    hash TEXT PRIMARY KEY,
+    classification_json TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_processed_messages_src ON processed_messages(source, message_id);
+CREATE INDEX IF NOT EXISTS idx_drafts_status_created ON drafts(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_drafts_slack_ts ON drafts(slack_notification_ts) WHERE slack_notification_ts IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_drafts_thread ON drafts(original_thread_id);
+CREATE INDEX IF NOT EXISTS idx_voice_examples_rt_ct ON voice_examples(recipient_type, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_voice_examples_ct ON voice_examples(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_voice_feedback_ct ON voice_feedback(created_at DESC);
 """
 
 
-def get_db(db_path: str) -> sqlite3.Connection:
+# scan_state key/value access shared by the Gmail client and scanner. Fixed SQL
+# text means each connection's statement cache compiles these once.
+GET_STATE_SQL = "SELECT value FROM scan_state WHERE key = ?"
+SET_STATE_SQL = "INSERT OR REPLACE INTO scan_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)"
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO-8601 string, for TIMESTAMP columns."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def get_db(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
     os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL only fsyncs on checkpoint, not on every commit
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+    conn.execute("PRAGMA cache_size=-64000")  # ~64MB page cache
     conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
 
-def init_db(db_path: str) -> sqlite3.Connection:
-    conn = get_db(db_path)
-    conn.executescript(SCHEMA)
-    conn.commit()
-    return conn
+class Database:
+    """Per-thread SQLite connections to one database file.
+
+    The scheduler, Slack monitor and HTTP handlers each run on their own threads;
+    giving every thread its own connection lets WAL serve readers concurrently
+    instead of funnelling everything through one shared Connection. Every connection
+    opened is also tracked so close() can shut them all down, including those of
+    background writer threads.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._conns_lock = threading.Lock()
+        self._conns: list[sqlite3.Connection] = []
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The calling thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only ever used by this thread; cross-thread access is just close()
+            conn = get_db(self.db_path, check_same_thread=False)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> sqlite3.Cursor:
+        return self.conn.execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Iterable[Any]]) -> sqlite3.Cursor:
+        return self.conn.executemany(sql, seq_of_params)
+
+    def executescript(self, script: str) -> sqlite3.Cursor:
+        return self.conn.executescript(script)
+
+    def commit(self):
+        self.conn.commit()
+
+    def get_state(self, key: str) -> str | None:
+        row = self.conn.execute(GET_STATE_SQL, (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_state(self, key: str, value: str):
+        """Upsert a scan_state value. Does not commit — callers decide the transaction."""
+        self.conn.execute(SET_STATE_SQL, (key, value))
+
+    def close(self):
+        """Close every connection opened through this Database (call at shutdown)."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local.conn = None
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc_info) -> bool:
+        return self.conn.__exit__(*exc_info)
+
+
+def init_db(db_path: str) -> Database:
+    db = Database(db_path)
+    db.executescript(SCHEMA)
+    db.commit()
+    return db
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import logging
-import sqlite3
+import threading
+import time
 
 import anthropic
+import httpx
 
 from assistant.config import Config
+from assistant.db import Database
 from assistant.models import (
     EmailClassification, EmailMessage, LinkedInDraftRequest, LinkedInDraftResponse,
     SlackClassification, SlackMessage,
@@ -15,6 +18,18 @@ from assistant.voice.profile import VoiceProfileManager
 
 logger = logging.getLogger(__name__)
 
+_CATEGORY_TO_RECIPIENT = {
+    "investor_intro": "investor",
+    "partnership_followup": "investor",
+    "deal_flow": "investor",
+    "internal_action": "internal",
+    "internal_fyi": "internal",
+    "portfolio_request": "partner",
+}
+
+# Voice profile refreshes daily and feedback trickles in, so a short TTL is plenty
+PROMPT_CACHE_TTL_SECONDS = 300
+
 DRAFT_SYSTEM_PROMPT = """You are drafting a response on behalf of Sarah Madden, Head of Investor Partnerships at Profound.
 
 Profound is an AI visibility platform (AEO — AI Engine Optimization) that helps companies show up in AI search (ChatGPT, Perplexity, Google AI Overviews, Gemini). Series C, ~$20-25M ARR, 500+ customers including Ramp, Chime, MongoDB, DocuSign.
@@ -38,12 +53,62 @@ You will receive the original message, the classification, and any thread contex
 Return ONLY the draft response text. No preamble, no explanation."""
 
 
+def _split_template(template: str, *placeholders: str) -> tuple[str, ...]:
+    """Split a template into the literal fragments around each placeholder, in order."""
+    parts = []
+    rest = template
+    for placeholder in placeholders:
+        head, rest = rest.split("{" + placeholder + "}", 1)
+        parts.append(head)
+    parts.append(rest)
+    return tuple(parts)
+
+
+# Pre-split once so building a prompt is a plain join instead of a str.format parse
+_PROMPT_PARTS = _split_template(
+    DRAFT_SYSTEM_PROMPT, "voice_profile_section", "feedback_section", "examples_section"
+)
+
+
 class DraftGenerator:
-    def __init__(self, config: Config, db: sqlite3.Connection):
-        self.client = anthropic.Anthropic(api_key=config.anthropic_api_key)
+    def __init__(
+        self, config: Config, db: Database, feedback_processor: VoiceFeedbackProcessor | None = None
+    ):
+        self._api_key = config.anthropic_api_key
+        self._client: anthropic.Anthropic | None = None
         self.model = config.model
         self.profile_manager = VoiceProfileManager(db)
-        self.feedback_processor = VoiceFeedbackProcessor(db)
+        # Share the app's processor so prompts see feedback still queued for writing
+        self.feedback_processor = feedback_processor or VoiceFeedbackProcessor(db)
+        self._prompt_cache: dict[str | None, tuple[float, str]] = {}
+        # Bumped by invalidate_caches so a prompt built from pre-invalidation data on
+        # another thread is not stored after the clear
+        self._prompt_generation = 0
+        self._prompt_lock = threading.Lock()
+
+    @property
+    def client(self) -> anthropic.Anthropic:
+        """Anthropic client, created on first use to keep startup light."""
+        if self._client is None:
+            # Sized so scanner + LinkedIn bursts reuse warm TLS connections instead of re-handshaking
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            )
+            self._client = anthropic.Anthropic(api_key=self._api_key, http_client=http_client)
+        return self._client
+
+    def close(self):
+        """Close the underlying HTTP connection pool."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def invalidate_caches(self):
+        """Drop cached prompts (call after the voice profile or feedback changes)."""
+        with self._prompt_lock:
+            self._prompt_generation += 1
+            self._prompt_cache.clear()
 
     def generate_email_draft(
         self,
@@ -188,27 +253,33 @@ class DraftGenerator:
 
     def _build_system_prompt(self, recipient_type: str | None = None) -> str:
         """Build the system prompt with voice profile and feedback."""
+        cached_at, cached = self._prompt_cache.get(recipient_type, (0.0, None))
+        if cached is not None and time.monotonic() - cached_at < PROMPT_CACHE_TTL_SECONDS:
+            return cached
+        generation = self._prompt_generation
+
         # Voice profile section
         profile = self.profile_manager.get_profile()
         if profile:
-            voice_section = (
-                "Sarah's writing style (learned from her sent emails):\n"
-                f"- Overall voice: {profile.get('overall_voice_summary', 'Direct, warm, specific')}\n"
-                f"- Greeting patterns: {', '.join(profile.get('greeting_patterns', []))}\n"
-                f"- Closing patterns: {', '.join(profile.get('closing_patterns', []))}\n"
-                f"- Sentence length: {profile.get('avg_sentence_length', 'short')}\n"
-                f"- Formality: {profile.get('formality_level', 3)}/5\n"
-                f"- Tone: {', '.join(profile.get('tone_markers', ['direct', 'warm']))}\n"
-                f"- Structure: {profile.get('structure_preference', 'short paragraphs')}\n"
-                f"- Typical length: {profile.get('typical_email_length', '2-4 sentences')}\n"
-            )
+            voice_parts = [
+                "Sarah's writing style (learned from her sent emails):\n",
+                f"- Overall voice: {profile.get('overall_voice_summary', 'Direct, warm, specific')}\n",
+                f"- Greeting patterns: {', '.join(profile.get('greeting_patterns', []))}\n",
+                f"- Closing patterns: {', '.join(profile.get('closing_patterns', []))}\n",
+                f"- Sentence length: {profile.get('avg_sentence_length', 'short')}\n",
+                f"- Formality: {profile.get('formality_level', 3)}/5\n",
+                f"- Tone: {', '.join(profile.get('tone_markers', ['direct', 'warm']))}\n",
+                f"- Structure: {profile.get('structure_preference', 'short paragraphs')}\n",
+                f"- Typical length: {profile.get('typical_email_length', '2-4 sentences')}\n",
+            ]
             avoid = profile.get("do_not_use", [])
             if avoid:
-                voice_section += f"- NEVER use: {', '.join(avoid)}\n"
+                voice_parts.append(f"- NEVER use: {', '.join(avoid)}\n")
 
             # Per-recipient notes
             if recipient_type and recipient_type in profile.get("per_recipient_notes", {}):
-                voice_section += f"- With {recipient_type}s: {profile['per_recipient_notes'][recipient_type]}\n"
+                voice_parts.append(f"- With {recipient_type}s: {profile['per_recipient_notes'][recipient_type]}\n")
+            voice_section = "".join(voice_parts)
         else:
             voice_section = (
                 "Sarah's writing style (defaults — will be refined after voice analysis):\n"
@@ -226,21 +297,26 @@ class DraftGenerator:
             feedback_section = ""
 
         # Examples section
-        examples = self.profile_manager.get_examples(recipient_type=recipient_type, limit=3)
+        examples = list(self.profile_manager.get_examples(recipient_type=recipient_type, limit=3))
         if examples:
             examples_text = "\n".join(
-                f"Example (to {ex.get('recipient_type', 'unknown')}):\nSubject: {ex.get('subject', '')}\n{ex.get('sent_text', '')[:500]}"
+                f"Example (to {ex['recipient_type'] or 'unknown'}):\nSubject: {ex['subject'] or ''}\n{(ex['sent_text'] or '')[:500]}"
                 for ex in examples
             )
             examples_section = f"Example emails Sarah has written:\n{examples_text}"
         else:
             examples_section = ""
 
-        return DRAFT_SYSTEM_PROMPT.format(
-            voice_profile_section=voice_section,
-            feedback_section=feedback_section,
-            examples_section=examples_section,
-        )
+        prompt = "".join((
+            _PROMPT_PARTS[0], voice_section,
+            _PROMPT_PARTS[1], feedback_section,
+            _PROMPT_PARTS[2], examples_section,
+            _PROMPT_PARTS[3],
+        ))
+        with self._prompt_lock:
+            if generation == self._prompt_generation:
+                self._prompt_cache[recipient_type] = (time.monotonic(), prompt)
+        return prompt
 
     def _format_email_context(
         self,
@@ -248,27 +324,21 @@ class DraftGenerator:
         classification: EmailClassification,
         thread_context: str | None,
     ) -> str:
-        parts = [
-            f"Draft a reply to this email.\n",
-            f"From: {email.from_name or ''} <{email.from_email}>",
-            f"Subject: {email.subject}",
-            f"Category: {classification.category.value}",
-            f"Priority: {classification.priority.value}",
-            f"Summary: {classification.summary}",
-        ]
-        if classification.draft_guidance:
-            parts.append(f"Guidance: {classification.draft_guidance}")
-        parts.append(f"\nOriginal message:\n{email.body_snippet}")
-        if thread_context:
-            parts.append(f"\nEarlier in this thread:\n{thread_context}")
-        return "\n".join(parts)
+        guidance = (
+            f"\nGuidance: {classification.draft_guidance}" if classification.draft_guidance else ""
+        )
+        thread = f"\n\nEarlier in this thread:\n{thread_context}" if thread_context else ""
+        return (
+            f"Draft a reply to this email.\n\n"
+            f"From: {email.from_name or ''} <{email.from_email}>\n"
+            f"Subject: {email.subject}\n"
+            f"Category: {classification.category}\n"
+            f"Priority: {classification.priority}\n"
+            f"Summary: {classification.summary}"
+            f"{guidance}\n"
+            f"\nOriginal message:\n{email.body_snippet}"
+            f"{thread}"
+        )
 
     def _guess_recipient_type(self, classification: EmailClassification) -> str | None:
-        category = classification.category.value
-        if category in ("investor_intro", "partnership_followup", "deal_flow"):
-            return "investor"
-        elif category in ("internal_action", "internal_fyi"):
-            return "internal"
-        elif category in ("portfolio_request",):
-            return "partner"
-        return None
+        return _CATEGORY_TO_RECIPIENT.get(classification.category)
@@ -1,19 +1,62 @@
 from __future__ import annotations
 
-import json
 import logging
 import sqlite3
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 
+from assistant.db import Database, utc_now_iso
 from assistant.models import Draft, DraftSource, DraftStatus
 
 logger = logging.getLogger(__name__)
 
+# One fixed statement per transition so sqlite3's statement cache can reuse the plan
+_STATUS_SQL = {
+    DraftStatus.APPROVED: "UPDATE drafts SET status = ?, approved_at = ? WHERE id = ?",
+    DraftStatus.REJECTED: "UPDATE drafts SET status = ?, rejected_at = ? WHERE id = ?",
+    DraftStatus.SENT: "UPDATE drafts SET status = ?, sent_at = ? WHERE id = ?",
+}
+_STATUS_SQL_DEFAULT = "UPDATE drafts SET status = ? WHERE id = ?"
+
+# RETURNING lets create() skip the follow-up SELECT (SQLite 3.35+)
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Processed (source, message_id) keys kept in memory in front of processed_messages
+PROCESSED_CACHE_SIZE = 4096
+
 
 class DraftStore:
-    def __init__(self, db: sqlite3.Connection):
+    def __init__(self, db: Database):
         self.db = db
+        self._processed_lock = threading.Lock()
+        self._processed: OrderedDict[tuple[str, str], None] = OrderedDict()
+        # True while the cache holds every processed row, so a miss is authoritative
+        # and the SQLite lookup can be skipped (the common case: new message IDs)
+        self._processed_complete = False
+        self._warm_processed()
+
+    def _warm_processed(self):
+        rows = self.db.execute(
+            "SELECT source, message_id FROM processed_messages ORDER BY processed_at DESC LIMIT ?",
+            (PROCESSED_CACHE_SIZE + 1,),
+        ).fetchall()
+        with self._processed_lock:
+            for row in reversed(rows[:PROCESSED_CACHE_SIZE]):
+                self._processed[(row["source"], row["message_id"])] = None
+            self._processed_complete = len(rows) <= PROCESSED_CACHE_SIZE
+
+    def remember_processed(self, keys: list[tuple[str, str]]):
+        """Record (source, message_id) keys as processed in memory only — for callers
+        that write the processed_messages rows themselves later."""
+        with self._processed_lock:
+            for key in keys:
+                self._processed[key] = None
+                self._processed.move_to_end(key)
+            while len(self._processed) > PROCESSED_CACHE_SIZE:
+                self._processed.popitem(last=False)
+                self._processed_complete = False
 
     def create(
         self,
@@ -32,25 +75,36 @@ class DraftStore:
     ) -> Draft:
         """Create a new draft and return it."""
         draft_id = str(uuid.uuid4())
-        now = datetime.utcnow().isoformat()
+        now = utc_now_iso()
 
-        self.db.execute(
-            """INSERT INTO drafts
+        sql = """INSERT INTO drafts
                (id, source, status, created_at, original_from, original_subject,
                 original_body, original_message_id, original_thread_id, original_channel_id,
                 category, priority, summary, draft_text, draft_subject)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+        if _HAS_RETURNING:
+            sql += " RETURNING *"
+        cursor = self.db.execute(
+            sql,
             (
-                draft_id, source.value, DraftStatus.PENDING_REVIEW.value, now,
+                draft_id, source, DraftStatus.PENDING_REVIEW, now,
                 original_from, original_subject, original_body, original_message_id,
                 original_thread_id, original_channel_id, category, priority,
                 summary, draft_text, draft_subject,
             ),
         )
+        row = cursor.fetchone() if _HAS_RETURNING else None
         self.db.commit()
-        logger.info("Created draft %s for %s from %s", draft_id, source.value, original_from)
+        logger.info("Created draft %s for %s from %s", draft_id, source, original_from)
+
+        if row is None:
+            return self.get(draft_id)
+        return self._row_to_draft(row)
 
-        return self.get(draft_id)
+    def commit(self):
+        """Commit pending updates. Update/mark methods don't commit on their own so
+        callers can batch a whole scan cycle or handler into one transaction."""
+        self.db.commit()
 
     def get(self, draft_id: str) -> Draft | None:
         """Get a draft by ID."""
@@ -59,22 +113,12 @@ class DraftStore:
             return None
         return self._row_to_draft(row)
 
-    def update_status(self, draft_id: str, status: DraftStatus):
-        """Update a draft's status."""
-        now = datetime.utcnow().isoformat()
-        updates = {"status": status.value}
-        if status == DraftStatus.APPROVED:
-            updates["approved_at"] = now
-        elif status == DraftStatus.REJECTED:
-            updates["rejected_at"] = now
-        elif status == DraftStatus.SENT:
-            updates["sent_at"] = now
-
-        set_clause = ", ".join(f"{k} = ?" for k in updates)
-        values = list(updates.values()) + [draft_id]
-        self.db.execute(f"UPDATE drafts SET {set_clause} WHERE id = ?", values)
-        self.db.commit()
-        logger.info("Draft %s status -> %s", draft_id, status.value)
+    def update_status(self, draft_id: str, status: DraftStatus) -> Draft | None:
+        """Update a draft's status and return the updated draft (None if it doesn't exist)."""
+        sql = _STATUS_SQL.get(status)
+        params = (status, utc_now_iso(), draft_id) if sql else (status, draft_id)
+        logger.info("Draft %s status -> %s", draft_id, status)
+        return self._update_returning(sql or _STATUS_SQL_DEFAULT, params, draft_id)
 
     def update_slack_notification(self, draft_id: str, ts: str, channel: str):
         """Store the Slack notification message timestamp for later updates."""
@@ -82,16 +126,22 @@ class DraftStore:
             "UPDATE drafts SET slack_notification_ts = ?, slack_notification_channel = ? WHERE id = ?",
             (ts, channel, draft_id),
         )
-        self.db.commit()
 
-    def update_edited_text(self, draft_id: str, edited_text: str):
-        """Store user-edited draft text."""
-        self.db.execute(
-            "UPDATE drafts SET edited_text = ? WHERE id = ?",
-            (edited_text, draft_id),
-        )
-        self.db.commit()
+    def update_edited_text(self, draft_id: str, edited_text: str) -> Draft | None:
+        """Store user-edited draft text and return the updated draft."""
         logger.info("Draft %s edited by user", draft_id)
+        return self._update_returning(
+            "UPDATE drafts SET edited_text = ? WHERE id = ?", (edited_text, draft_id), draft_id
+        )
+
+    def _update_returning(self, sql: str, params: tuple, draft_id: str) -> Draft | None:
+        """Run a single-draft UPDATE and return the row as written, without a second query
+        where RETURNING is available."""
+        if not _HAS_RETURNING:
+            self.db.execute(sql, params)
+            return self.get(draft_id)
+        row = self.db.execute(sql + " RETURNING *", params).fetchone()
+        return self._row_to_draft(row) if row else None
 
     def get_final_text(self, draft: Draft) -> str:
         """Get the final text to send (edited if available, otherwise original draft)."""
@@ -99,18 +149,38 @@ class DraftStore:
 
     def is_processed(self, message_id: str, source: str) -> bool:
         """Check if a message has already been processed."""
+        key = (source, message_id)
+        with self._processed_lock:
+            if key in self._processed:
+                self._processed.move_to_end(key)
+                return True
+            if self._processed_complete:
+                return False
         row = self.db.execute(
             "SELECT 1 FROM processed_messages WHERE message_id = ? AND source = ?",
             (message_id, source),
         ).fetchone()
-        return row is not None
+        if row is None:
+            return False
+        self.remember_processed([key])
+        return True
 
     def mark_processed(self, message_id: str, source: str, classification_json: str | None = None):
         """Mark a message as processed."""
         self.db.execute(
             "INSERT OR IGNORE INTO processed_messages (message_id, source, processed_at, classification_json) VALUES (?, ?, ?, ?)",
-            (message_id, source, datetime.utcnow().isoformat(), classification_json),
+            (message_id, source, utc_now_iso(), classification_json),
         )
+        self.remember_processed([(source, message_id)])
+
+    def mark_processed_many(self, rows: list[tuple[str, str, str | None]]):
+        """Mark a batch of (message_id, source, classification_json) rows processed in one commit."""
+        now = utc_now_iso()
+        self.db.executemany(
+            "INSERT OR IGNORE INTO processed_messages (message_id, source, processed_at, classification_json) VALUES (?, ?, ?, ?)",
+            [(message_id, source, now, classification_json) for message_id, source, classification_json in rows],
+        )
+        self.remember_processed([(source, message_id) for message_id, source, _ in rows])
         self.db.commit()
 
     def _row_to_draft(self, row: sqlite3.Row) -> Draft:
@@ -118,7 +188,7 @@ class DraftStore:
             id=row["id"],
             source=DraftSource(row["source"]),
             status=DraftStatus(row["status"]),
-            created_at=row["created_at"],
+            created_at=datetime.fromisoformat(row["created_at"]),
             original_from=row["original_from"],
             original_subject=row["original_subject"],
             original_body=row["original_body"],
@@ -132,5 +202,12 @@ class DraftStore:
             draft_subject=row["draft_subject"],
             slack_notification_ts=row["slack_notification_ts"],
             slack_notification_channel=row["slack_notification_channel"],
+            approved_at=_parse_ts(row["approved_at"]),
+            rejected_at=_parse_ts(row["rejected_at"]),
+            sent_at=_parse_ts(row["sent_at"]),
             edited_text=row["edited_text"],
         )
+
+
+def _parse_ts(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
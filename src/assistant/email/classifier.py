@@ -1,12 +1,20 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import hashlib
 import logging
+import re
+import threading
+import time
+from collections import deque
 
 import anthropic
+import orjson
+from pydantic import TypeAdapter, ValidationError
 
 from assistant.config import Config
-from assistant.models import EmailClassification, EmailMessage
+from assistant.db import Database
+from assistant.models import EmailCategory, EmailClassification, EmailMessage
 
 logger = logging.getLogger(__name__)
 
@@ -39,59 +47,329 @@ Action rules:
 - skip: Newsletters, marketing emails, automated notifications she doesn't need to see
 - archive: System notifications (Salesforce, Notion, calendar confirmations, receipts)
 
-Return valid JSON only. No markdown, no code blocks."""
+Record your classification by calling the classify_email tool."""
+
+# Built once: validator setup is amortised across every classification
+_CLASSIFICATION_ADAPTER = TypeAdapter(EmailClassification)
+
+# Forced tool call: the model must answer with input matching EmailClassification,
+# so there is no free-text JSON to parse
+CLASSIFY_TOOL = {
+    "name": "classify_email",
+    "description": "Record the triage classification for this email.",
+    "input_schema": EmailClassification.model_json_schema(),
+}
+
+# Senders that are always machines — system notifications get archived without an LLM call
+_AUTOMATED_SENDER_RE = re.compile(
+    r"^(no-?reply|do-?not-?reply|notifications?|alerts?|mailer-daemon)@|@(mailer|notifications?)\.",
+    re.IGNORECASE,
+)
+
+# Role mailboxes that send to lists, not to one person
+_ROLE_SENDER_RE = re.compile(
+    r"^(news(letters?)?|marketing|updates?|digest|hello|info|team|events?|community|billing|receipts?)@",
+    re.IGNORECASE,
+)
+
+# Reply/forward boundaries — everything below is quoted history the classifier doesn't need
+_QUOTE_HEADER_RE = re.compile(r"^(On .* wrote:|-----Original Message-----)\s*$", re.MULTILINE)
+# URLs longer than 60 chars in total, scheme included
+_LONG_URL_RE = re.compile(r"https://\S{53,}|http://\S{54,}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Only bulk mail is cached: a real correspondent reusing a subject and opening must
+# get a fresh summary and draft guidance. Entries expire after a week either way.
+CACHEABLE_CATEGORIES = frozenset({EmailCategory.NEWSLETTER, EmailCategory.MARKETING, EmailCategory.AUTOMATED})
+CLASSIFICATION_CACHE_TTL = "-7 days"  # SQLite datetime() modifier
+
+# Concurrent classification (scanner path): start at 5 in flight, AIMD between 1 and 10
+CONCURRENCY_INITIAL = 5
+CONCURRENCY_MAX = 10
+TARGET_LATENCY_SECONDS = 3.0
+MAX_ATTEMPTS = 4  # first try + 3 retries at 1s, 2s, 4s
+
+
+class RateLimiter:
+    """Blocking sliding-window limiter for the Anthropic requests-per-minute and
+    tokens-per-minute tier limits. Token counts are estimated up front and
+    reconciled against `response.usage` once the call returns."""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window: deque[list] = deque()  # [timestamp, tokens] per request
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, estimated_tokens: int) -> list:
+        """Block until the window has room, then record the request. Returns a handle for reconcile()."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= self.WINDOW_SECONDS:
+                    self._tokens -= self._window.popleft()[1]
+                fits_tokens = self._tokens + estimated_tokens <= self.tokens_per_minute
+                # An oversized request still goes through once the window is empty
+                if len(self._window) < self.requests_per_minute and (fits_tokens or not self._window):
+                    entry = [now, estimated_tokens]
+                    self._window.append(entry)
+                    self._tokens += estimated_tokens
+                    return entry
+                wait = self.WINDOW_SECONDS - (now - self._window[0][0])
+            time.sleep(max(wait, 0.05))
+
+    def reconcile(self, entry: list, actual_tokens: int):
+        """Replace a request's estimated token count with the real usage."""
+        with self._lock:
+            if time.monotonic() - entry[0] < self.WINDOW_SECONDS:
+                self._tokens += actual_tokens - entry[1]
+                entry[1] = actual_tokens
+
+
+class _AdaptiveLimiter:
+    """Concurrency limit with AIMD: halve on rate limiting, +1 after a fast success."""
+
+    def __init__(self, limit: int, maximum: int):
+        self.limit = limit
+        self.maximum = maximum
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_rate_limited(self):
+        self.limit = max(1, self.limit // 2)
+
+    def on_success(self, latency: float):
+        if latency < TARGET_LATENCY_SECONDS and self.limit < self.maximum:
+            self.limit += 1
 
 
 class EmailClassifier:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, db: Database):
+        self.db = db
         self.client = anthropic.Anthropic(api_key=config.anthropic_api_key)
         self.model = config.model
+        self.user_email = config.gmail_user_email.lower()
+        self._api_key = config.anthropic_api_key
+        self._aclient: anthropic.AsyncAnthropic | None = None
+        self._concurrency_limit = CONCURRENCY_INITIAL
+        self.rate_limiter = RateLimiter(config.anthropic_rpm, config.anthropic_tpm)
+
+    @property
+    def aclient(self) -> anthropic.AsyncAnthropic:
+        """Async client for concurrent classification. SDK retries are off so the
+        limiter below sees every 429 and owns the backoff."""
+        if self._aclient is None:
+            self._aclient = anthropic.AsyncAnthropic(api_key=self._api_key, max_retries=0)
+        return self._aclient
 
     def classify(self, email: EmailMessage) -> EmailClassification:
         """Classify a single email."""
-        email_text = self._format_email(email)
-
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=500,
-            system=CLASSIFY_SYSTEM_PROMPT,
-            messages=[
-                {"role": "user", "content": f"Classify this email:\n\n{email_text}"}
-            ],
-        )
+        shortcut = self.prefilter(email) or self.lookup_cached([email]).get(email.message_id)
+        if shortcut:
+            return shortcut
 
-        response_text = response.content[0].text.strip()
-        try:
-            data = json.loads(response_text)
-            return EmailClassification(**data)
-        except (json.JSONDecodeError, Exception) as e:
-            logger.error("Failed to parse classification: %s\nResponse: %s", e, response_text[:200])
-            # Default to FYI so nothing gets lost
+        params = self._request_params(email)
+        entry = self.rate_limiter.acquire(self._estimate_tokens(params))
+        response = self.client.messages.create(**params)
+        self.rate_limiter.reconcile(entry, response.usage.input_tokens + response.usage.output_tokens)
+        classification = self._parse_classification(_tool_input(response), email)
+        if classification is None:
+            return self._default_classification(f"Could not classify: {email.subject}")
+        self.store_cached([(email, classification)])
+        self.db.commit()
+        return classification
+
+    def prefilter(self, email: EmailMessage) -> EmailClassification | None:
+        """Deterministic classification for obvious bulk/automated mail, or None if the
+        email needs the LLM. Replies are never short-circuited."""
+        if email.is_reply:
+            return None
+        if _AUTOMATED_SENDER_RE.search(email.from_email):
+            return EmailClassification(
+                category="automated",
+                priority="standard",
+                action="archive",
+                summary=f"Automated notification: {email.subject}",
+            )
+        if "CATEGORY_PROMOTIONS" in email.labels:
             return EmailClassification(
-                category="internal_fyi",
+                category="marketing",
                 priority="standard",
-                action="fyi_only",
-                summary=f"Could not classify: {email.subject}",
+                action="skip",
+                summary=f"Promotional email: {email.subject}",
             )
+        # List-Unsubscribe and Gmail's Updates tab also catch one-to-one sequenced mail
+        # (HubSpot, Outreach, mail merge) from investors and partners, so they only
+        # short-circuit when the message also looks sent to a list
+        if not self._is_list_mail(email):
+            return None
+        if email.has_unsubscribe:
+            return EmailClassification(
+                category="newsletter",
+                priority="standard",
+                action="skip",
+                summary=f"Mailing list email: {email.subject}",
+            )
+        if "CATEGORY_UPDATES" in email.labels:
+            return EmailClassification(
+                category="automated",
+                priority="standard",
+                action="skip",
+                summary=f"Automated update: {email.subject}",
+            )
+        return None
+
+    def _is_list_mail(self, email: EmailMessage) -> bool:
+        """Whether the email went to a list rather than to Sarah personally."""
+        if email.is_list_mail or _ROLE_SENDER_RE.search(email.from_email):
+            return True
+        recipients = [addr.lower() for addr in (*email.to, *email.cc)]
+        return bool(self.user_email) and self.user_email not in recipients
+
+    async def classify_batch_async(self, emails: list[EmailMessage]) -> list[EmailClassification | None]:
+        """Classify emails concurrently for the latency-sensitive scanner path.
+        In-flight requests adapt to rate limits (AIMD); results keep input order.
 
-    def classify_batch(self, emails: list[EmailMessage]) -> list[EmailClassification]:
-        """Classify multiple emails. Processes individually to avoid confusion."""
-        results = []
-        for email in emails:
+        Runs on the event loop, so it never touches SQLite: the caller checks
+        lookup_cached beforehand and stores the results afterwards. An entry is None
+        where classification failed (see default_classification)."""
+        limiter = _AdaptiveLimiter(self._concurrency_limit, CONCURRENCY_MAX)
+        results = await asyncio.gather(
+            *(self._classify_async(email, limiter) for email in emails)
+        )
+        self._concurrency_limit = limiter.limit
+        return list(results)
+
+    async def _classify_async(
+        self, email: EmailMessage, limiter: _AdaptiveLimiter
+    ) -> EmailClassification | None:
+        shortcut = self.prefilter(email)
+        if shortcut:
+            return shortcut
+
+        params = self._request_params(email)
+        for attempt in range(MAX_ATTEMPTS):
             try:
-                result = self.classify(email)
-                results.append(result)
-            except Exception:
-                logger.exception("Failed to classify email %s", email.message_id)
-                results.append(
-                    EmailClassification(
-                        category="internal_fyi",
-                        priority="standard",
-                        action="fyi_only",
-                        summary=f"Classification failed: {email.subject}",
+                async with limiter:
+                    entry = await asyncio.to_thread(
+                        self.rate_limiter.acquire, self._estimate_tokens(params)
                     )
+                    started = time.monotonic()
+                    response = await self.aclient.messages.create(**params)
+                limiter.on_success(time.monotonic() - started)
+                self.rate_limiter.reconcile(
+                    entry, response.usage.input_tokens + response.usage.output_tokens
                 )
-        return results
+                return self._parse_classification(_tool_input(response), email)
+            except (anthropic.RateLimitError, anthropic.InternalServerError, anthropic.APIConnectionError) as e:
+                if isinstance(e, anthropic.RateLimitError):
+                    limiter.on_rate_limited()
+                if attempt == MAX_ATTEMPTS - 1:
+                    logger.exception("Giving up classifying email %s", email.message_id)
+                    break
+                await asyncio.sleep(2 ** attempt)
+            except Exception:
+                logger.exception("Failed to classify email %s", email.message_id)
+                break
+        return None
+
+    def _request_params(self, email: EmailMessage) -> dict:
+        """messages.create parameters for one email (shared by sync and async calls)."""
+        return {
+            "model": self.model,
+            "max_tokens": 500,
+            "temperature": 0.0,
+            # Static prefix — cached server-side so repeat calls are billed at the cache-read rate
+            "system": [
+                {"type": "text", "text": CLASSIFY_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {"role": "user", "content": f"Classify this email:\n\n{self._format_email(email)}"}
+            ],
+            "tools": [CLASSIFY_TOOL],
+            "tool_choice": {"type": "tool", "name": "classify_email"},
+        }
+
+    def _estimate_tokens(self, params: dict) -> int:
+        # ~4 chars per token for the email, plus the max_tokens reserved for the reply
+        return len(params["messages"][0]["content"]) // 4 + params["max_tokens"]
+
+    def _parse_classification(self, data: dict, email: EmailMessage) -> EmailClassification | None:
+        """Validated classification, or None if the tool input doesn't validate."""
+        try:
+            return _CLASSIFICATION_ADAPTER.validate_python(data)
+        except ValidationError as e:
+            logger.error("Classification of %s failed validation: %s\nInput: %s", email.message_id, e, str(data)[:200])
+            return None
+
+    def _cache_key(self, email: EmailMessage) -> str:
+        # Same sender + subject + opening text ⇒ same classification (newsletters, alerts, receipts);
+        # only trusted for bulk categories and within CLASSIFICATION_CACHE_TTL
+        raw = f"{email.from_email}\x00{email.subject}\x00{email.body_snippet[:500]}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def lookup_cached(self, emails: list[EmailMessage]) -> dict[str, EmailClassification]:
+        """Cached classifications for a batch of emails in one query (message_id -> classification).
+        Blocking SQLite work — keep it off the event loop."""
+        keys = {self._cache_key(email): email.message_id for email in emails}
+        if not keys:
+            return {}
+        rows = self.db.execute(
+            f"SELECT hash, classification_json FROM classification_cache"
+            f" WHERE hash IN ({', '.join('?' * len(keys))}) AND created_at >= datetime('now', ?)",
+            [*keys, CLASSIFICATION_CACHE_TTL],
+        ).fetchall()
+        hits = {}
+        for row in rows:
+            classification = _CLASSIFICATION_ADAPTER.validate_json(row["classification_json"])
+            if classification.category in CACHEABLE_CATEGORIES:
+                hits[keys[row["hash"]]] = classification
+        if hits:
+            logger.debug("Classification cache hits: %d/%d", len(hits), len(emails))
+        return hits
+
+    def store_cached(self, results: list[tuple[EmailMessage, EmailClassification]]):
+        """Cache freshly classified bulk emails with one executemany and drop expired
+        entries. Does not commit — callers decide the transaction."""
+        results = [(email, c) for email, c in results if c.category in CACHEABLE_CATEGORIES]
+        if not results:
+            return
+        self.db.execute(
+            "DELETE FROM classification_cache WHERE created_at < datetime('now', ?)",
+            (CLASSIFICATION_CACHE_TTL,),
+        )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO classification_cache (hash, classification_json) VALUES (?, ?)",
+            [
+                (self._cache_key(email), orjson.dumps(classification.model_dump()).decode())
+                for email, classification in results
+            ],
+        )
+
+    def default_classification(self, email: EmailMessage) -> EmailClassification:
+        """Fallback when an email could not be classified — FYI so nothing gets lost."""
+        return self._default_classification(f"Classification failed: {email.subject}")
+
+    def _default_classification(self, summary: str) -> EmailClassification:
+        return EmailClassification(
+            category="internal_fyi",
+            priority="standard",
+            action="fyi_only",
+            summary=summary,
+        )
 
     def _format_email(self, email: EmailMessage) -> str:
         parts = [
@@ -103,5 +381,24 @@ class EmailClassifier:
         parts.append(f"Subject: {email.subject}")
         parts.append(f"Date: {email.date.strftime('%Y-%m-%d %H:%M')}")
         parts.append(f"Is Reply: {email.is_reply}")
-        parts.append(f"\n{email.body_snippet}")
+        parts.append(f"\n{_compress_for_llm(email.body_snippet)}")
         return "\n".join(parts)
+
+
+def _tool_input(message) -> dict:
+    """The classify_email tool call's input from a forced tool-use response."""
+    for block in message.content:
+        if block.type == "tool_use":
+            return block.input
+    return {}
+
+
+def _compress_for_llm(body: str) -> str:
+    """Drop quoted history and noise from an email body to cut prompt tokens."""
+    match = _QUOTE_HEADER_RE.search(body)
+    if match:
+        body = body[:match.start()]
+    body = "\n".join(line for line in body.splitlines() if not line.lstrip().startswith(">"))
+    body = _LONG_URL_RE.sub("<url>", body)
+    return _BLANK_LINES_RE.sub("\n\n", body).strip()
+
@@ -1,21 +1,50 @@
 from __future__ import annotations
 
 import base64
-import json
 import logging
-import sqlite3
-from datetime import datetime
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
 from email.mime.text import MIMEText
+from email.utils import getaddresses, parseaddr, parsedate_to_datetime
 
+import httplib2
+import orjson
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from selectolax.parser import HTMLParser
 
 from assistant.config import Config
+from assistant.db import Database
 from assistant.models import EmailMessage
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Gmail allows 100 calls per batch but advises staying at 50 to avoid rate limiting
+GMAIL_BATCH_SIZE = 50
+
+# Sub-requests of a batch fail individually (usually rateLimitExceeded once the batch
+# trips the per-user quota); those are re-batched after 1s, 2s, 4s, 8s
+GMAIL_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+GMAIL_BATCH_MAX_ATTEMPTS = 5
+
+# Original-message excerpt shown in Slack draft notifications
+NOTIFICATION_SNIPPET_CHARS = 1500
+
+# Headers needed to triage a message before deciding whether to download the body
+METADATA_HEADERS = [
+    "From", "To", "Cc", "Subject", "Date", "List-Unsubscribe", "List-Id", "Precedence",
+    "In-Reply-To", "References",
+]
+
 SCOPES = [
     "https://www.googleapis.com/auth/gmail.readonly",
     "https://www.googleapis.com/auth/gmail.send",
@@ -24,27 +53,57 @@ SCOPES = [
 
 
 class GmailClient:
-    def __init__(self, config: Config, db: sqlite3.Connection):
-        token_info = json.loads(config.gmail_token_json)
+    def __init__(self, config: Config, db: Database):
+        token_info = orjson.loads(config.gmail_token_json)
         self.creds = Credentials.from_authorized_user_info(token_info, SCOPES)
         self.user_email = config.gmail_user_email
         self.db = db
+        # httplib2.Http is not thread-safe, and the client is used from the scanner's
+        # worker threads, the Slack thread and the scheduler. Each thread keeps its own
+        # persistent connection instead of sharing one or reconnecting per request.
+        self._local = threading.local()
         self._ensure_creds()
-        self.service = build("gmail", "v1", credentials=self.creds)
+        self.service = build(
+            "gmail", "v1", http=self._thread_http(), requestBuilder=self._build_request
+        )
+
+    def _thread_http(self) -> AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=60))
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs) -> HttpRequest:
+        return HttpRequest(self._thread_http(), *args, **kwargs)
 
     def _ensure_creds(self):
         if self.creds.expired and self.creds.refresh_token:
-            self.creds.refresh(Request())
-            # Persist refreshed token in scan_state
-            self.db.execute(
-                "INSERT OR REPLACE INTO scan_state (key, value, updated_at) VALUES (?, ?, ?)",
-                ("gmail_token_json", self.creds.to_json(), datetime.utcnow().isoformat()),
-            )
-            self.db.commit()
-            logger.info("Gmail token refreshed and saved")
+            self._refresh_creds()
+
+    def _refresh_creds(self):
+        self.creds.refresh(Request())
+        # Persist refreshed token in scan_state
+        self.db.set_state("gmail_token_json", self.creds.to_json())
+        self.db.commit()
+        logger.info("Gmail token refreshed and saved")
+
+    def refresh_if_near_expiry(self, buffer_seconds: int = 300):
+        """Scheduled job: refresh the token ahead of expiry so scans and sends never wait on it."""
+        if not self.creds.refresh_token:
+            return
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if self.creds.expiry and self.creds.expiry - now > timedelta(seconds=buffer_seconds):
+            return
+        try:
+            self._refresh_creds()
+        except Exception:
+            logger.exception("Proactive Gmail token refresh failed")
 
-    def get_unread_messages(self, max_results: int = 20) -> list[EmailMessage]:
-        """Fetch unread inbox messages."""
+    def get_unread_messages(self, max_results: int = 20, metadata_only: bool = False) -> list[EmailMessage]:
+        """Fetch unread inbox messages. With metadata_only, bodies are left out
+        (body_snippet is Gmail's short snippet) — see get_messages to fetch them."""
         self._ensure_creds()
         results = (
             self.service.users()
@@ -56,12 +115,9 @@ class GmailClient:
         if not messages:
             return []
 
-        parsed = []
-        for msg_stub in messages:
-            msg = self._get_message(msg_stub["id"])
-            if msg:
-                parsed.append(msg)
-        return parsed
+        return self.get_messages(
+            [msg_stub["id"] for msg_stub in messages], "metadata" if metadata_only else "full"
+        )
 
     def get_sent_emails(self, max_results: int = 100) -> list[EmailMessage]:
         """Fetch sent emails for voice analysis."""
@@ -76,12 +132,7 @@ class GmailClient:
         if not messages:
             return []
 
-        parsed = []
-        for msg_stub in messages:
-            msg = self._get_message(msg_stub["id"])
-            if msg:
-                parsed.append(msg)
-        return parsed
+        return self.get_messages([msg_stub["id"] for msg_stub in messages])
 
     def get_thread(self, thread_id: str) -> list[EmailMessage]:
         """Get full thread for context when drafting a reply."""
@@ -146,59 +197,111 @@ class GmailClient:
         profile = self.service.users().getProfile(userId="me").execute()
         return profile["historyId"]
 
-    def get_new_messages_since(self, history_id: str, max_results: int = 20) -> list[EmailMessage]:
-        """Incremental sync: get messages added since the given historyId."""
+    def get_new_messages_since(
+        self, history_id: str, max_results: int = 20, metadata_only: bool = False
+    ) -> tuple[list[EmailMessage], str]:
+        """Incremental sync: get messages added since the given historyId.
+
+        Also returns the historyId to resume from next time: the one history.list
+        reports after its last page, or — when the stored id has expired and this
+        falls back to an unread scan — the mailbox's current id taken before listing."""
         self._ensure_creds()
-        try:
-            history = (
-                self.service.users()
-                .history()
-                .list(
-                    userId="me",
-                    startHistoryId=history_id,
-                    historyTypes=["messageAdded"],
-                    labelId="INBOX",
-                    maxResults=max_results,
+        message_ids: dict[str, None] = {}  # insertion-ordered, de-duplicated
+        page_token = None
+        while True:
+            try:
+                history = (
+                    self.service.users()
+                    .history()
+                    .list(
+                        userId="me",
+                        startHistoryId=history_id,
+                        historyTypes=["messageAdded"],
+                        labelId="INBOX",
+                        maxResults=max_results,
+                        pageToken=page_token,
+                    )
+                    .execute()
                 )
-                .execute()
+            except Exception as e:
+                if page_token is None and ("404" in str(e) or "historyId" in str(e).lower()):
+                    logger.warning("History ID %s expired, falling back to unread scan", history_id)
+                    baseline = self.get_history_id()
+                    return self.get_unread_messages(max_results, metadata_only), baseline
+                raise
+
+            for record in history.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    msg = added.get("message", {})
+                    if "INBOX" in msg.get("labelIds", []):
+                        message_ids[msg["id"]] = None
+
+            # Every page must be read before jumping to the reported id, or the
+            # messages on later pages would never be seen
+            page_token = history.get("nextPageToken")
+            if not page_token:
+                break
+
+        new_history_id = history.get("historyId") or history_id
+        if not message_ids:
+            return [], new_history_id
+        messages = self.get_messages(list(message_ids), "metadata" if metadata_only else "full")
+        return messages, new_history_id
+
+    def get_messages(self, message_ids: list[str], message_format: str = "full") -> list[EmailMessage]:
+        """Fetch several messages with batched HTTP requests instead of one round-trip each.
+        message_format is "full" or "metadata" (headers + snippet only).
+
+        Sub-requests that fail transiently are retried with backoff; if any still fail,
+        the last error is raised so callers don't move their sync point past them.
+        Messages that fail permanently (e.g. deleted since listing) are skipped."""
+        responses: dict[str, dict] = {}
+        failed: dict[str, HttpError] = {}
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                responses[request_id] = response
+            elif _is_retryable(exception):
+                failed[request_id] = exception
+            else:
+                logger.error("Failed to fetch message %s: %s", request_id, exception)
+
+        pending = list(message_ids)
+        for attempt in range(GMAIL_BATCH_MAX_ATTEMPTS):
+            failed.clear()
+            for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+                batch = self.service.new_batch_http_request(callback=on_response)
+                for message_id in pending[start:start + GMAIL_BATCH_SIZE]:
+                    if message_format == "metadata":
+                        request = self.service.users().messages().get(
+                            userId="me", id=message_id, format="metadata", metadataHeaders=METADATA_HEADERS
+                        )
+                    else:
+                        request = self.service.users().messages().get(userId="me", id=message_id, format="full")
+                    batch.add(request, request_id=message_id)
+                batch.execute()
+            if not failed:
+                break
+            if attempt == GMAIL_BATCH_MAX_ATTEMPTS - 1:
+                raise next(iter(failed.values()))
+            pending = list(failed)
+            delay = 2**attempt
+            logger.warning(
+                "%d message fetches failed transiently, retrying in %ds (attempt %d/%d)",
+                len(pending), delay, attempt + 1, GMAIL_BATCH_MAX_ATTEMPTS,
             )
-        except Exception as e:
-            if "404" in str(e) or "historyId" in str(e).lower():
-                logger.warning("History ID %s expired, falling back to unread scan", history_id)
-                return self.get_unread_messages(max_results)
-            raise
-
-        new_message_ids = set()
-        for record in history.get("history", []):
-            for added in record.get("messagesAdded", []):
-                msg = added.get("message", {})
-                if "INBOX" in msg.get("labelIds", []):
-                    new_message_ids.add(msg["id"])
-
-        if not new_message_ids:
-            return []
+            time.sleep(delay)
 
         parsed = []
-        for msg_id in new_message_ids:
-            msg = self._get_message(msg_id)
+        for message_id in message_ids:
+            msg_data = responses.get(message_id)
+            if not msg_data:
+                continue
+            msg = self._parse_message(msg_data)
             if msg:
                 parsed.append(msg)
         return parsed
 
-    def _get_message(self, message_id: str) -> EmailMessage | None:
-        """Fetch a single message by ID."""
-        try:
-            msg_data = (
-                self.service.users()
-                .messages()
-                .get(userId="me", id=message_id, format="full")
-                .execute()
-            )
-            return self._parse_message(msg_data)
-        except Exception:
-            logger.exception("Failed to fetch message %s", message_id)
-            return None
-
     def _parse_message(self, msg_data: dict) -> EmailMessage | None:
         """Parse a Gmail API message response into an EmailMessage."""
         try:
@@ -206,22 +309,12 @@ class GmailClient:
             body = self._extract_body(msg_data.get("payload", {}))
             snippet = body[:2000] if body else msg_data.get("snippet", "")
 
-            from_header = headers.get("from", "")
-            from_email = from_header
-            from_name = None
-            if "<" in from_header and ">" in from_header:
-                from_name = from_header.split("<")[0].strip().strip('"')
-                from_email = from_header.split("<")[1].split(">")[0]
-
-            to_header = headers.get("to", "")
-            to_list = [addr.strip() for addr in to_header.split(",") if addr.strip()]
-            cc_header = headers.get("cc", "")
-            cc_list = [addr.strip() for addr in cc_header.split(",") if cc_header and addr.strip()]
+            from_name, from_email = parseaddr(headers.get("from", ""))
+            to_list = [addr for _, addr in getaddresses([headers.get("to", "")]) if addr]
+            cc_list = [addr for _, addr in getaddresses([headers.get("cc", "")]) if addr]
 
-            date_str = headers.get("date", "")
             try:
-                from email.utils import parsedate_to_datetime
-                date = parsedate_to_datetime(date_str)
+                date = parsedate_to_datetime(headers.get("date", ""))
             except Exception:
                 date = datetime.utcnow()
 
@@ -231,46 +324,66 @@ class GmailClient:
                 message_id=msg_data["id"],
                 thread_id=msg_data.get("threadId", msg_data["id"]),
                 from_email=from_email,
-                from_name=from_name,
+                from_name=from_name or None,
                 to=to_list,
                 cc=cc_list,
                 subject=headers.get("subject", "(no subject)"),
                 body_snippet=snippet,
-                body_full=body,
+                notification_snippet=snippet[:NOTIFICATION_SNIPPET_CHARS],
+                body_full=body or None,
                 date=date,
                 labels=labels,
-                is_reply="Re:" in headers.get("subject", ""),
+                # Threading headers are authoritative; a "Re:" subject is neither
+                # necessary (Re[2]:, RE:, localized prefixes) nor sufficient (Fwd: Re:)
+                is_reply=bool(headers.get("in-reply-to") or headers.get("references")),
+                has_unsubscribe="list-unsubscribe" in headers,
+                is_list_mail="list-id" in headers
+                or headers.get("precedence", "").strip().lower() in ("bulk", "list", "junk"),
             )
         except Exception:
             logger.exception("Failed to parse message %s", msg_data.get("id"))
             return None
 
     def _extract_body(self, payload: dict) -> str:
-        """Extract plain text body from Gmail message payload."""
-        if payload.get("mimeType") == "text/plain" and payload.get("body", {}).get("data"):
-            return base64.urlsafe_b64decode(payload["body"]["data"]).decode("utf-8", errors="replace")
-
-        # Multipart: look for text/plain first, then text/html
-        parts = payload.get("parts", [])
-        for part in parts:
-            if part.get("mimeType") == "text/plain" and part.get("body", {}).get("data"):
-                return base64.urlsafe_b64decode(part["body"]["data"]).decode("utf-8", errors="replace")
-
-        # Nested multipart
-        for part in parts:
-            if part.get("parts"):
-                result = self._extract_body(part)
-                if result:
-                    return result
-
-        # Fallback to HTML if no plain text
-        for part in parts:
-            if part.get("mimeType") == "text/html" and part.get("body", {}).get("data"):
-                html = base64.urlsafe_b64decode(part["body"]["data"]).decode("utf-8", errors="replace")
-                # Basic HTML stripping — good enough for classification
-                import re
-                text = re.sub(r"<[^>]+>", " ", html)
-                text = re.sub(r"\s+", " ", text).strip()
-                return text
-
+        """Extract plain text body from Gmail message payload.
+
+        One breadth-first walk of the MIME tree picks the first text/plain part
+        (shallowest first), falling back to the first text/html part; only the
+        chosen part is base64-decoded."""
+        plain = html = None
+        queue = deque([payload])
+        while queue:
+            part = queue.popleft()
+            data = part.get("body", {}).get("data")
+            if data:
+                mime_type = part.get("mimeType")
+                if mime_type == "text/plain":
+                    plain = data
+                    break
+                if mime_type == "text/html" and html is None:
+                    html = data
+            queue.extend(part.get("parts", ()))
+
+        if plain is not None:
+            return base64.urlsafe_b64decode(plain).decode("utf-8", errors="replace")
+        if html is not None:
+            return self._html_to_text(base64.urlsafe_b64decode(html).decode("utf-8", errors="replace"))
         return ""
+
+    def _html_to_text(self, html: str) -> str:
+        """Visible text of an HTML body, without script/style content."""
+        tree = HTMLParser(html)
+        tree.strip_tags(["script", "style"])
+        root = tree.body or tree.root
+        if root is None:
+            return ""
+        return _WHITESPACE_RE.sub(" ", root.text(separator=" ")).strip()
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate-limit or transient server error on a batch sub-request."""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    # Gmail also reports per-user quota as 403 (user)rateLimitExceeded
+    return status in GMAIL_RETRYABLE_STATUS or (status == 403 and b"ratelimitexceeded" in (error.content or b"").lower())
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
-import sqlite3
+
+import orjson
 
 from assistant.config import Config
+from assistant.db import Database
 from assistant.drafts.generator import DraftGenerator
 from assistant.drafts.store import DraftStore
 from assistant.email.classifier import EmailClassifier
 from assistant.email.gmail_client import GmailClient
-from assistant.models import DraftSource, EmailAction
+from assistant.models import DraftSource, EmailAction, EmailClassification, EmailMessage
 from assistant.notifications.notifier import SlackNotifier
 
 logger = logging.getLogger(__name__)
@@ -26,7 +28,7 @@ class EmailScanner:
         draft_generator: DraftGenerator,
         draft_store: DraftStore,
         notifier: SlackNotifier,
-        db: sqlite3.Connection,
+        db: Database,
     ):
         self.config = config
         self.gmail = gmail_client
@@ -36,56 +38,119 @@ class EmailScanner:
         self.notifier = notifier
         self.db = db
 
-    def scan(self):
-        """Run one scan cycle: fetch new emails, classify, draft, notify."""
+    async def scan(self):
+        """Run one scan cycle: fetch new emails, classify them concurrently, draft, notify.
+        Gmail, drafting and SQLite work is blocking, so it runs off the event loop."""
         logger.info("Starting email scan...")
 
         try:
-            # Try incremental sync first
-            history_id = self._get_stored_history_id()
-            if history_id:
-                emails = self.gmail.get_new_messages_since(history_id)
-            else:
-                emails = self.gmail.get_unread_messages(max_results=20)
-
-            # Update stored history ID
-            new_history_id = self.gmail.get_history_id()
-            self._store_history_id(new_history_id)
-
+            emails, history_id = await asyncio.to_thread(self._fetch_new_emails)
             if not emails:
-                logger.info("No new emails")
                 return
 
-            logger.info("Found %d new emails", len(emails))
-
-            for email in emails:
-                # Skip if already processed
-                if self.drafts.is_processed(email.message_id, "email"):
-                    continue
-
-                try:
-                    self._process_email(email)
-                except Exception:
-                    logger.exception("Failed to process email %s", email.message_id)
+            # Obvious bulk/automated mail is decided from headers alone;
+            # only the rest needs full bodies for the LLM
+            shortcuts = [self.classifier.prefilter(email) for email in emails]
+            needs_body = [e.message_id for e, shortcut in zip(emails, shortcuts) if shortcut is None]
+            if needs_body:
+                full = await asyncio.to_thread(self.gmail.get_messages, needs_body)
+                full_by_id = {e.message_id: e for e in full}
+                emails = [full_by_id.get(e.message_id, e) for e in emails]
+
+            # Cache lookup is blocking SQLite work, so it runs off the loop too
+            to_classify = [e for e, shortcut in zip(emails, shortcuts) if shortcut is None]
+            cached = await asyncio.to_thread(self.classifier.lookup_cached, to_classify)
+            to_classify = [e for e in to_classify if e.message_id not in cached]
+
+            llm_results = await self.classifier.classify_batch_async(to_classify)
+            fresh = [(e, c) for e, c in zip(to_classify, llm_results) if c is not None]
+            by_id = {
+                e.message_id: c or self.classifier.default_classification(e)
+                for e, c in zip(to_classify, llm_results)
+            }
+            by_id.update(cached)
+            classifications = [
+                shortcut or by_id[email.message_id] for email, shortcut in zip(emails, shortcuts)
+            ]
+
+            await asyncio.to_thread(self._process_emails, emails, classifications, history_id, fresh)
 
         except Exception:
             logger.exception("Email scan failed")
 
-    def _process_email(self, email):
-        """Process a single email: classify, draft if needed, notify."""
-        classification = self.classifier.classify(email)
+    def _fetch_new_emails(self) -> tuple[list[EmailMessage], str | None]:
+        """Fetch emails since the last scan that haven't been processed yet.
+        Also returns the historyId to store once they have been handled."""
+        # Try incremental sync first
+        history_id = self._get_stored_history_id()
+        if history_id:
+            emails, new_history_id = self.gmail.get_new_messages_since(history_id, metadata_only=True)
+        else:
+            # Baseline from getProfile before listing, so nothing arriving in between is skipped
+            new_history_id = self.gmail.get_history_id()
+            emails = self.gmail.get_unread_messages(max_results=20, metadata_only=True)
+
+        # Skip if already processed
+        emails = [e for e in emails if not self.drafts.is_processed(e.message_id, "email")]
+        if not emails:
+            logger.info("No new emails")
+            if new_history_id != history_id:
+                self._store_history_id(new_history_id)
+                self.db.commit()
+            return [], None
 
-        # Mark as processed
+        logger.info("Found %d new emails", len(emails))
+        return emails, new_history_id
+
+    def _process_emails(
+        self,
+        emails: list[EmailMessage],
+        classifications: list[EmailClassification],
+        history_id: str | None,
+        fresh: list[tuple[EmailMessage, EmailClassification]],
+    ):
+        """Act on each classified email, then record the rest of the scan in one short
+        transaction. `fresh` are the LLM classifications to add to the classifier's cache."""
+        notifications: list[tuple[str, str, str]] = []
+        try:
+            for email, classification in zip(emails, classifications):
+                try:
+                    self._process_email(email, classification, notifications)
+                except Exception:
+                    logger.exception("Failed to process email %s", email.message_id)
+        finally:
+            # One short transaction once all Gmail/Claude/Slack I/O is done, so the
+            # write lock is never held across network calls: notification addresses,
+            # new cache entries and the sync point
+            with self.db:
+                self.classifier.store_cached(fresh)
+                for draft_id, ts, channel in notifications:
+                    self.drafts.update_slack_notification(draft_id, ts, channel)
+                if history_id:
+                    self._store_history_id(history_id)
+
+    def _process_email(
+        self,
+        email: EmailMessage,
+        classification: EmailClassification,
+        notifications: list[tuple[str, str, str]],
+    ):
+        """Process a single classified email: draft if needed, notify.
+        Appends any (draft_id, ts, channel) notification address to `notifications`
+        for the caller to write."""
+        # Mark as processed before acting on it, committed on its own, so a restart
+        # mid-scan can never draft or notify the same email twice
         self.drafts.mark_processed(
-            email.message_id, "email", classification.model_dump_json()
+            email.message_id, "email", orjson.dumps(classification.model_dump()).decode()
         )
+        self.drafts.commit()
 
         logger.info(
             "Email from %s: category=%s priority=%s action=%s",
             email.from_email,
-            classification.category.value,
-            classification.priority.value,
-            classification.action.value,
+            classification.category,
+            classification.priority,
+            classification.action,
         )
 
         if classification.action == EmailAction.DRAFT_RESPONSE:
@@ -118,8 +183,8 @@ class EmailScanner:
                 draft_text=draft_text,
                 original_subject=email.subject,
                 original_thread_id=email.thread_id,
-                category=classification.category.value,
-                priority=classification.priority.value,
+                category=classification.category,
+                priority=classification.priority,
                 summary=classification.summary,
                 draft_subject=email.subject,
             )
@@ -128,7 +193,7 @@ class EmailScanner:
             ts, channel = self.notifier.send_email_draft_notification(
                 draft, email, classification
             )
-            self.drafts.update_slack_notification(draft.id, ts, channel)
+            notifications.append((draft.id, ts, channel))
 
         elif classification.action == EmailAction.FYI_ONLY:
             self.notifier.send_fyi_notification(email, classification)
@@ -143,14 +208,7 @@ class EmailScanner:
         # SKIP action: do nothing
 
     def _get_stored_history_id(self) -> str | None:
-        row = self.db.execute(
-            "SELECT value FROM scan_state WHERE key = 'gmail_history_id'"
-        ).fetchone()
-        return row["value"] if row else None
+        return self.db.get_state("gmail_history_id")
 
     def _store_history_id(self, history_id: str):
-        self.db.execute(
-            "INSERT OR REPLACE INTO scan_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
-            ("gmail_history_id", history_id),
-        )
-        self.db.commit()
+        self.db.set_state("gmail_history_id", history_id)
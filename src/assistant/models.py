@@ -1,15 +1,16 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from datetime import datetime
-from enum import Enum
+from enum import StrEnum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 
 
 # --- Email classification ---
 
 
-class EmailCategory(str, Enum):
+class EmailCategory(StrEnum):
     INVESTOR_INTRO = "investor_intro"
     PORTFOLIO_REQUEST = "portfolio_request"
     PARTNERSHIP_FOLLOWUP = "partnership_followup"
@@ -24,13 +25,13 @@ class EmailCategory(str, Enum):
     AUTOMATED = "automated"
 
 
-class EmailPriority(str, Enum):
+class EmailPriority(StrEnum):
     URGENT = "urgent"
     HIGH = "high"
     STANDARD = "standard"
 
 
-class EmailAction(str, Enum):
+class EmailAction(StrEnum):
     DRAFT_RESPONSE = "draft_response"
     FYI_ONLY = "fyi_only"
     SKIP = "skip"
@@ -45,19 +46,23 @@ class EmailClassification(BaseModel):
     draft_guidance: str | None = None
 
 
-class EmailMessage(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class EmailMessage:
     message_id: str
     thread_id: str
     from_email: str
     from_name: str | None = None
-    to: list[str] = []
-    cc: list[str] = []
+    to: list[str] = field(default_factory=list)
+    cc: list[str] = field(default_factory=list)
     subject: str
     body_snippet: str
+    notification_snippet: str = ""  # body_snippet cut to the Slack notification size
     body_full: str | None = None
     date: datetime
-    labels: list[str] = []
+    labels: list[str] = field(default_factory=list)
     is_reply: bool = False
+    has_unsubscribe: bool = False  # List-Unsubscribe header present (also set by mail-merge tools)
+    is_list_mail: bool = False  # List-Id or Precedence: bulk/list — sent to a list, not a person
 
 
 # --- Slack classification ---
@@ -71,7 +76,8 @@ class SlackClassification(BaseModel):
     draft_guidance: str | None = None
 
 
-class SlackMessage(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SlackMessage:
     ts: str
     thread_ts: str | None = None
     channel_id: str
@@ -85,7 +91,7 @@ class SlackMessage(BaseModel):
 # --- Drafts ---
 
 
-class DraftStatus(str, Enum):
+class DraftStatus(StrEnum):
     PENDING_REVIEW = "pending_review"
     APPROVED = "approved"
     REJECTED = "rejected"
@@ -94,16 +100,17 @@ class DraftStatus(str, Enum):
     EXPIRED = "expired"
 
 
-class DraftSource(str, Enum):
+class DraftSource(StrEnum):
     EMAIL = "email"
     SLACK = "slack"
 
 
-class Draft(BaseModel):
-    id: str = Field(description="UUID")
+@dataclass(slots=True, kw_only=True)
+class Draft:
+    id: str  # UUID
     source: DraftSource
     status: DraftStatus = DraftStatus.PENDING_REVIEW
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=datetime.utcnow)
 
     # Original message context
     original_from: str
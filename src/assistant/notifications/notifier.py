@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import atexit
 import logging
+import queue
+import ssl
+import threading
+import time
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Callable
 
+from cachetools import LRUCache
 from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
 
 from assistant.config import Config
-from assistant.models import Draft, EmailClassification, EmailMessage
+from assistant.models import Draft, EmailClassification, EmailMessage, EmailPriority
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +25,183 @@ PRIORITY_EMOJI = {
     "standard": ":white_circle:",
 }
 
+_SSL_CONTEXT = ssl.create_default_context()
+
+# Slack allows ~1 message/sec per channel with short bursts
+CHANNEL_RATE_PER_SECOND = 1.0
+CHANNEL_BURST = 5
+MAX_SEND_ATTEMPTS = 3
+
+# FYIs are collected for this long and posted as one digest of at most FYI_MAX_BATCH
+FYI_FLUSH_INTERVAL = 10.0
+FYI_MAX_BATCH = 10
+
+STATUS_FLUSH_INTERVAL = 1.0
+# Past this many pending notifications, standard-priority FYIs are dropped and draft
+# status updates are coalesced (latest per notification) instead of sent inline
+SHED_QUEUE_DEPTH = 100
+
+NOTIFY_ADDR_CACHE_SIZE = 1024
+
+
+# Static Block Kit pieces shared by every notification; Slack payloads only read them
+_DIVIDER = {"type": "divider"}
+_ORIGINAL_LABEL = {"type": "context", "elements": [{"type": "mrkdwn", "text": "*Original Message*"}]}
+_DRAFT_LABEL = {"type": "context", "elements": [{"type": "mrkdwn", "text": "*Draft Response*"}]}
+_EDITED_LABEL = {"type": "context", "elements": [{"type": "mrkdwn", "text": "*Edited Draft*"}]}
+
+# Action buttons; each send clones these with the draft id as the value
+_BTN_SEND = MappingProxyType(
+    {"type": "button", "text": {"type": "plain_text", "text": "Send"}, "style": "primary",
+     "action_id": "approve_draft"}
+)
+_BTN_EDIT = MappingProxyType(
+    {"type": "button", "text": {"type": "plain_text", "text": "Edit"}, "action_id": "edit_draft"}
+)
+_BTN_REJECT = MappingProxyType(
+    {"type": "button", "text": {"type": "plain_text", "text": "Reject"}, "style": "danger",
+     "action_id": "reject_draft"}
+)
+_BTN_SKIP = MappingProxyType(
+    {"type": "button", "text": {"type": "plain_text", "text": "Skip"}, "action_id": "skip_draft"}
+)
+
+
+def _build_action_buttons(draft_id: str, include_skip: bool = True) -> dict:
+    """The Send/Edit/Reject(/Skip) actions block for a draft notification."""
+    buttons = (_BTN_SEND, _BTN_EDIT, _BTN_REJECT, _BTN_SKIP) if include_skip else (_BTN_SEND, _BTN_EDIT, _BTN_REJECT)
+    return {"type": "actions", "elements": [{**button, "value": draft_id} for button in buttons]}
+
+
+class _RateLimiter:
+    """Per-channel token bucket so bursts of notifications pace themselves instead
+    of tripping Slack's 429s and stalling on Retry-After."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}  # channel -> (tokens, last_refill)
+
+    def acquire(self, channel: str):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last_refill = self._buckets.get(channel, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last_refill) * self.rate)
+                if tokens >= 1:
+                    self._buckets[channel] = (tokens - 1, now)
+                    return
+                self._buckets[channel] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self, channel: str, seconds: float):
+        """Empty the bucket so the next token for this channel arrives in `seconds`."""
+        with self._lock:
+            self._buckets[channel] = (1 - seconds * self.rate, time.monotonic())
+
+
+def _retry_after(headers: dict) -> float:
+    """Retry-After seconds from a Slack response. slack_sdk keeps headers in a plain
+    dict, so the name is matched case-insensitively; defaults to 1s."""
+    for name, value in headers.items():
+        if name.lower() == "retry-after":
+            return float(value)
+    return 1.0
+
+
+class _FyiBuffer:
+    """Collects FYI items and hands them to `flush` in batches from a background thread."""
+
+    def __init__(self, flush: Callable[[list], None]):
+        self._flush = flush
+        self._queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="fyi-digest")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, item):
+        self._queue.put(item)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while not self._stop.wait(FYI_FLUSH_INTERVAL):
+            self._drain()
+
+    def _drain(self):
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(items), FYI_MAX_BATCH):
+            try:
+                self._flush(items[start:start + FYI_MAX_BATCH])
+            except Exception:
+                logger.exception("Failed to send FYI digest")
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=FYI_FLUSH_INTERVAL)
+        self._drain()
+
 
 class SlackNotifier:
     def __init__(self, config: Config):
-        self.client = WebClient(token=config.slack_bot_token)
+        # One client for the whole app (SlackMonitor hands it to Bolt too). WebClient
+        # is thread-safe; the shared SSL context spares a CA-bundle load per call.
+        self.client = WebClient(token=config.slack_bot_token, ssl=_SSL_CONTEXT)
         self.user_id = config.slack_user_id
+        self._limiter = _RateLimiter(CHANNEL_RATE_PER_SECOND, CHANNEL_BURST)
+        self._write_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._fyi = _FyiBuffer(self._post_fyi_digest)
+
+        # draft_id -> (channel, ts) of its notification, for button handlers
+        self._notify_addr_lock = threading.Lock()
+        self._notify_addr: LRUCache[str, tuple[str, str]] = LRUCache(maxsize=NOTIFY_ADDR_CACHE_SIZE)
+
+        # Status updates are coalesced per notification ts and flushed in the background
+        self._status_lock = threading.Lock()
+        self._pending_status: dict[str, tuple[str, str, Draft]] = {}  # ts -> (channel, status, draft)
+        self._status_stop = threading.Event()
+        self._status_thread = threading.Thread(
+            target=self._run_status_updates, daemon=True, name="slack-status-updates"
+        )
+        self._status_thread.start()
+
+    def notification_address(self, draft_id: str) -> tuple[str, str] | None:
+        """(channel, ts) of a draft notification sent by this process, if remembered."""
+        with self._notify_addr_lock:
+            return self._notify_addr.get(draft_id)
+
+    def _queue_depth(self) -> int:
+        """Notifications waiting to go out (queued FYIs + pending status updates)."""
+        with self._status_lock:
+            pending_status = len(self._pending_status)
+        return self._fyi.qsize() + pending_status
+
+    def _send(self, channel: str, fn, **kwargs):
+        """Call a chat.* method for `channel` under its rate limit, honouring Retry-After.
+        Writes to one channel are serialized so Slack clients render them in call order
+        (an update can't overtake the post it edits)."""
+        with self._write_locks[channel]:
+            for attempt in range(MAX_SEND_ATTEMPTS):
+                self._limiter.acquire(channel)
+                try:
+                    return fn(channel=channel, **kwargs)
+                except SlackApiError as e:
+                    if e.response.get("error") != "ratelimited" or attempt == MAX_SEND_ATTEMPTS - 1:
+                        raise
+                    retry_after = _retry_after(e.response.headers)
+                    logger.warning("Slack rate limited on %s — waiting %.0fs", channel, retry_after)
+                    self._limiter.drain(channel, retry_after)
 
     def send_email_draft_notification(
         self,
@@ -29,11 +211,10 @@ class SlackNotifier:
     ) -> str:
         """Send a Slack DM with the original email and draft response, with action buttons.
         Returns the message timestamp for later updates."""
-        priority_emoji = PRIORITY_EMOJI.get(classification.priority.value, ":white_circle:")
-        priority_label = classification.priority.value.upper()
+        priority_emoji = PRIORITY_EMOJI.get(classification.priority, ":white_circle:")
+        priority_label = classification.priority.upper()
 
-        # Truncate original body for the notification
-        original_body = email.body_snippet[:1500]
+        original_body = email.notification_snippet
         draft_text = draft.draft_text[:2000]
 
         blocks = [
@@ -50,104 +231,102 @@ class SlackNotifier:
                     {"type": "mrkdwn", "text": f"*From:* {email.from_name or email.from_email}"},
                     {"type": "mrkdwn", "text": f"*Received:* {email.date.strftime('%I:%M %p')}"},
                     {"type": "mrkdwn", "text": f"*Subject:* {email.subject}"},
-                    {"type": "mrkdwn", "text": f"*Category:* {classification.category.value}"},
-                ],
-            },
-            {"type": "divider"},
-            {
-                "type": "context",
-                "elements": [
-                    {"type": "mrkdwn", "text": "*Original Message*"},
+                    {"type": "mrkdwn", "text": f"*Category:* {classification.category}"},
                 ],
             },
+            _DIVIDER,
+            _ORIGINAL_LABEL,
             {
                 "type": "section",
                 "text": {"type": "mrkdwn", "text": original_body},
             },
-            {"type": "divider"},
-            {
-                "type": "context",
-                "elements": [
-                    {"type": "mrkdwn", "text": "*Draft Response*"},
-                ],
-            },
+            _DIVIDER,
+            _DRAFT_LABEL,
             {
                 "type": "section",
                 "text": {"type": "mrkdwn", "text": draft_text},
             },
-            {"type": "divider"},
-            {
-                "type": "actions",
-                "elements": [
-                    {
-                        "type": "button",
-                        "text": {"type": "plain_text", "text": "Send"},
-                        "style": "primary",
-                        "action_id": "approve_draft",
-                        "value": draft.id,
-                    },
-                    {
-                        "type": "button",
-                        "text": {"type": "plain_text", "text": "Edit"},
-                        "action_id": "edit_draft",
-                        "value": draft.id,
-                    },
-                    {
-                        "type": "button",
-                        "text": {"type": "plain_text", "text": "Reject"},
-                        "style": "danger",
-                        "action_id": "reject_draft",
-                        "value": draft.id,
-                    },
-                    {
-                        "type": "button",
-                        "text": {"type": "plain_text", "text": "Skip"},
-                        "action_id": "skip_draft",
-                        "value": draft.id,
-                    },
-                ],
-            },
+            _DIVIDER,
+            _build_action_buttons(draft.id),
         ]
 
-        response = self.client.chat_postMessage(
-            channel=self.user_id,  # DM to user
+        response = self._send(
+            self.user_id,  # DM to user
+            self.client.chat_postMessage,
             text=f"Email draft: {email.subject} from {email.from_email}",
             blocks=blocks,
         )
         ts = response["ts"]
         channel = response["channel"]
+        with self._notify_addr_lock:
+            self._notify_addr[draft.id] = (channel, ts)
         logger.info("Sent draft notification for %s (ts=%s)", draft.id, ts)
         return ts, channel
 
     def send_fyi_notification(self, email: EmailMessage, classification: EmailClassification):
-        """Send a simpler FYI notification (no draft, no buttons)."""
-        priority_emoji = PRIORITY_EMOJI.get(classification.priority.value, ":white_circle:")
+        """Queue a simpler FYI notification (no draft, no buttons). FYIs arriving
+        together are posted as one digest message."""
+        if classification.priority == EmailPriority.STANDARD and self._queue_depth() > SHED_QUEUE_DEPTH:
+            # Under sustained load, standard FYIs are the first thing to give up
+            logger.warning("Notification backlog — dropping standard FYI %s", email.subject)
+            return
+        priority_emoji = PRIORITY_EMOJI.get(classification.priority, ":white_circle:")
+        self._fyi.put(
+            (priority_emoji, email.subject, email.from_name or email.from_email, classification.summary)
+        )
 
+    def _post_fyi_digest(self, items: list[tuple[str, str, str, str]]):
         blocks = [
             {
                 "type": "section",
                 "text": {
                     "type": "mrkdwn",
-                    "text": (
-                        f"{priority_emoji} *FYI — {email.subject}*\n"
-                        f"From: {email.from_name or email.from_email}\n"
-                        f"{classification.summary}"
-                    ),
+                    "text": f"{priority_emoji} *FYI — {subject}*\nFrom: {sender}\n{summary}",
                 },
-            },
+            }
+            for priority_emoji, subject, sender, summary in items
         ]
+        if len(items) == 1:
+            text = f"FYI: {items[0][1]} from {items[0][2]}"
+        else:
+            text = f"{len(items)} FYIs: " + "; ".join(subject for _, subject, _, _ in items)
+            blocks.insert(0, {"type": "header", "text": {"type": "plain_text", "text": f"{len(items)} FYIs"}})
 
-        self.client.chat_postMessage(
-            channel=self.user_id,
-            text=f"FYI: {email.subject} from {email.from_email}",
-            blocks=blocks,
-        )
-        logger.info("Sent FYI notification for %s", email.subject)
+        self._send(self.user_id, self.client.chat_postMessage, text=text, blocks=blocks)
+        logger.info("Sent FYI digest with %d emails", len(items))
+
+    def close(self):
+        """Flush queued FYIs and status updates and stop their threads."""
+        self._fyi.close()
+        self._status_stop.set()
+        self._status_thread.join(timeout=STATUS_FLUSH_INTERVAL * 2)
+        self._flush_status_updates()
 
     def update_draft_status(self, channel: str, ts: str, status_text: str, draft: Draft):
-        """Update an existing draft notification to show its new status."""
-        draft_text = draft.edited_text or draft.draft_text
+        """Update an existing draft notification to show its new status.
+
+        Sent right away normally; under load (see SHED_QUEUE_DEPTH) it is queued for
+        the background flush, where only the latest status per notification is sent."""
+        if self._queue_depth() > SHED_QUEUE_DEPTH:
+            with self._status_lock:
+                self._pending_status[ts] = (channel, status_text, draft)
+            return
+        with self._status_lock:
+            # This status supersedes anything still queued for the same notification
+            self._pending_status.pop(ts, None)
+        self._post_status_update(channel, ts, status_text, draft)
 
+    def _run_status_updates(self):
+        while not self._status_stop.wait(STATUS_FLUSH_INTERVAL):
+            self._flush_status_updates()
+
+    def _flush_status_updates(self):
+        with self._status_lock:
+            pending, self._pending_status = self._pending_status, {}
+        for ts, (channel, status_text, draft) in pending.items():
+            self._post_status_update(channel, ts, status_text, draft)
+
+    def _post_status_update(self, channel: str, ts: str, status_text: str, draft: Draft):
         blocks = [
             {
                 "type": "section",
@@ -168,8 +347,9 @@ class SlackNotifier:
         ]
 
         try:
-            self.client.chat_update(
-                channel=channel,
+            self._send(
+                channel,
+                self.client.chat_update,
                 ts=ts,
                 text=f"Draft {status_text.lower()}: {draft.original_subject}",
                 blocks=blocks,
@@ -177,10 +357,46 @@ class SlackNotifier:
         except Exception:
             logger.exception("Failed to update draft notification %s", ts)
 
+    def update_edited_draft(self, channel: str, ts: str, draft: Draft, edited_text: str):
+        """Re-render a draft notification with the user's edited text and the action buttons."""
+        blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": (
+                        f"*Re: {draft.original_subject}*\n"
+                        f"From: {draft.original_from}\n"
+                        f"_{draft.summary}_"
+                    ),
+                },
+            },
+            _DIVIDER,
+            _EDITED_LABEL,
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": edited_text[:2000]},
+            },
+            _DIVIDER,
+            _build_action_buttons(draft.id, include_skip=False),
+        ]
+
+        try:
+            self._send(
+                channel,
+                self.client.chat_update,
+                ts=ts,
+                text=f"Edited draft: {draft.original_subject}",
+                blocks=blocks,
+            )
+        except Exception:
+            logger.exception("Failed to update edited draft notification")
+
     def send_ephemeral_draft(self, channel_id: str, thread_ts: str, draft_text: str):
         """Post an ephemeral draft reply in a Slack thread (only visible to the user)."""
-        self.client.chat_postEphemeral(
-            channel=channel_id,
+        self._send(
+            channel_id,
+            self.client.chat_postEphemeral,
             user=self.user_id,
             thread_ts=thread_ts,
             text=f"Draft response (only visible to you):\n\n{draft_text}",
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import random
+import threading
 
 import anthropic
 
@@ -10,6 +13,12 @@ from assistant.models import SlackClassification, SlackMessage
 
 logger = logging.getLogger(__name__)
 
+# Timeout / conflict / rate-limit / overload / transient server errors worth retrying
+# (the statuses the SDK's own retries cover, plus 503/529)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+MAX_ATTEMPTS = 8
+MAX_BACKOFF_SECONDS = 30
+
 SLACK_CLASSIFY_SYSTEM_PROMPT = """You are a Slack monitoring assistant for Sarah Madden (Head of Investor Partnerships at Profound).
 
 Analyze this Slack message and determine if Sarah needs to respond.
@@ -35,20 +44,49 @@ A message does NOT need response if:
 5. It's in a channel Sarah monitors but the topic isn't her domain
 6. Sarah sent the message herself
 
-Return valid JSON only:
-{{"needs_response": true/false, "reason": "why", "urgency": "high/medium/low", "summary": "1 sentence", "draft_guidance": "what to say" or null}}"""
+Record your answer by calling the classify tool: needs_response, reason (why), urgency (high/medium/low), summary (1 sentence), draft_guidance (what to say, or null)."""
+
+# Forced tool call so the answer arrives as schema-shaped input, not free text
+CLASSIFY_TOOL = {
+    "name": "classify",
+    "description": "Record whether Sarah needs to respond to this Slack message.",
+    "input_schema": SlackClassification.model_json_schema(),
+}
 
 
 class SlackClassifier:
+    """Classifies Slack messages on its own event loop thread with the async client,
+    so concurrent classifications share one thread instead of blocking one each."""
+
     def __init__(self, config: Config):
-        self.client = anthropic.Anthropic(api_key=config.anthropic_api_key)
+        # Retries are handled by _retry (longer, jittered) rather than the SDK's
+        self._aclient = anthropic.AsyncAnthropic(api_key=config.anthropic_api_key, max_retries=0)
         self.model = config.model
         self.user_id = config.slack_user_id
+        # Formatted once; cached server-side so each classify bills it at the cache-read rate
+        self._system = [
+            {
+                "type": "text",
+                "text": SLACK_CLASSIFY_SYSTEM_PROMPT.format(user_id=config.slack_user_id),
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+        # Also used by SlackMonitor for its async Slack lookups
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self.loop.run_forever, daemon=True, name="slack-classifier-loop"
+        ).start()
 
     def classify(self, message: SlackMessage, thread_context: str | None = None) -> SlackClassification:
+        """Classify whether a Slack message needs Sarah's response (blocking; for worker threads)."""
+        return asyncio.run_coroutine_threadsafe(
+            self.classify_async(message, thread_context), self.loop
+        ).result()
+
+    async def classify_async(
+        self, message: SlackMessage, thread_context: str | None = None
+    ) -> SlackClassification:
         """Classify whether a Slack message needs Sarah's response."""
-        system = SLACK_CLASSIFY_SYSTEM_PROMPT.format(user_id=self.user_id)
-
         user_content = (
             f"Channel: {message.channel_name or message.channel_id}\n"
             f"From: {message.user_name or message.user_id}\n"
@@ -58,18 +96,24 @@ class SlackClassifier:
         if thread_context:
             user_content += f"\nThread context:\n{thread_context}\n"
 
-        response = self.client.messages.create(
+        response = await self._retry(
+            self._aclient.messages.create,
             model=self.model,
-            max_tokens=300,
-            system=system,
+            max_tokens=200,  # the tool input is a handful of short fields
+            system=self._system,
             messages=[{"role": "user", "content": user_content}],
+            tools=[CLASSIFY_TOOL],
+            tool_choice={"type": "tool", "name": "classify"},
         )
 
-        response_text = response.content[0].text.strip()
         try:
-            data = json.loads(response_text)
-            return SlackClassification(**data)
-        except (json.JSONDecodeError, Exception) as e:
+            if response.stop_reason == "tool_use":
+                data = next(block.input for block in response.content if block.type == "tool_use")
+            else:
+                # Truncated or refused tool call — fall back to any JSON in the text
+                data = json.loads(next(block.text for block in response.content if block.type == "text").strip())
+            return SlackClassification.model_validate(data)
+        except Exception as e:
             logger.error("Failed to parse Slack classification: %s", e)
             return SlackClassification(
                 needs_response=False,
@@ -77,3 +121,29 @@ class SlackClassifier:
                 urgency="low",
                 summary="Could not classify message",
             )
+
+    async def _retry(self, fn, *args, **kwargs):
+        """Await fn, retrying retryable API errors and connection failures/timeouts with
+        exponential backoff and jitter (or the server's retry-after when given)."""
+        for attempt in range(MAX_ATTEMPTS):
+            retry_after = None
+            try:
+                return await fn(*args, **kwargs)
+            except anthropic.APIStatusError as e:
+                if e.status_code not in RETRYABLE_STATUS or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                error = str(e.status_code)
+                retry_after = e.response.headers.get("retry-after")
+            except anthropic.APIConnectionError as e:  # includes APITimeoutError
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                error = type(e).__name__
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(MAX_BACKOFF_SECONDS, 2**attempt) + random.uniform(0, 1)
+            logger.warning(
+                "Slack classify got %s, retrying in %.1fs (attempt %d/%d)",
+                error, delay, attempt + 1, MAX_ATTEMPTS,
+            )
+            await asyncio.sleep(delay)
@@ -1,24 +1,56 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import sqlite3
+import queue
+import re
 import threading
+import time
 
+from cachetools import TTLCache
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_sdk import WebClient
+from slack_sdk.web.async_client import AsyncWebClient
 
 from assistant.config import Config
+from assistant.db import Database
 from assistant.drafts.generator import DraftGenerator
 from assistant.drafts.store import DraftStore
 from assistant.email.gmail_client import GmailClient
-from assistant.models import DraftSource, DraftStatus, SlackMessage
+from assistant.models import Draft, DraftSource, DraftStatus, SlackClassification, SlackMessage
 from assistant.notifications.notifier import SlackNotifier
 from assistant.slack_monitor.classifier import SlackClassifier
 from assistant.voice.feedback import VoiceFeedbackProcessor
 
 logger = logging.getLogger(__name__)
 
+NAME_CACHE_TTL_SECONDS = 3600
+SLACK_LOOKUP_TIMEOUT_SECONDS = 10
+MESSAGE_WORKERS = 4
+WORK_QUEUE_SIZE = 256
+PROCESSED_FLUSH_SECONDS = 0.1
+PROCESSED_FLUSH_BATCH = 64
+
+# Whole-message acknowledgements that never need a drafted reply
+_ACK_RE = re.compile(
+    r"^(ok(ay)?|k|ty|thx|thanks?( you)?|np|done|got it|sounds good|\+1|:[a-z0-9_+-]+:|👍|👌|🙏)[.!]*$",
+    re.IGNORECASE,
+)
+
+
+async def _none_on_error(coro):
+    """Await a lookup, turning failures and timeouts into None."""
+    try:
+        return await asyncio.wait_for(coro, SLACK_LOOKUP_TIMEOUT_SECONDS)
+    except Exception:
+        logger.warning("Slack lookup failed", exc_info=True)
+        return None
+
+
+async def _none():
+    return None
+
 
 class SlackMonitor:
     """Slack Bolt app that monitors channels/DMs and handles interactive approval flows."""
@@ -31,7 +63,7 @@ class SlackMonitor:
         notifier: SlackNotifier,
         gmail_client: GmailClient,
         feedback_processor: VoiceFeedbackProcessor,
-        db: sqlite3.Connection,
+        db: Database,
     ):
         self.config = config
         self.drafts = draft_store
@@ -43,10 +75,31 @@ class SlackMonitor:
         self.db = db
         self.monitored_channels = set(config.slack_channel_ids)
 
+        # users.info / conversations.info results; failures are not cached
+        self._name_lock = threading.Lock()
+        self._user_names: TTLCache[str, str | None] = TTLCache(maxsize=1024, ttl=NAME_CACHE_TTL_SECONDS)
+        self._channel_names: TTLCache[str, str | None] = TTLCache(maxsize=256, ttl=NAME_CACHE_TTL_SECONDS)
+        self._bot_users: set[str] = set()  # user IDs users.info reported as bots
+        self._in_flight: set[str] = set()  # message ts currently being handled
+        self._in_flight_lock = threading.Lock()
+        # Per-message Slack lookups run concurrently on the classifier's event loop
+        self._aclient = AsyncWebClient(token=config.slack_bot_token)
+
         # Build the Slack Bolt app
-        self.app = App(token=config.slack_bot_token)
+        self.app = App(client=notifier.client)
         self._register_handlers()
 
+        # Message events are processed off Bolt's dispatcher by a fixed worker pool
+        self._work: queue.Queue[tuple[dict, WebClient]] = queue.Queue(maxsize=WORK_QUEUE_SIZE)
+        for i in range(MESSAGE_WORKERS):
+            threading.Thread(
+                target=self._process_message_job, daemon=True, name=f"slack-worker-{i}"
+            ).start()
+
+        # Processed markers are written behind the hot path in batches
+        self._processed_pending: queue.Queue[tuple[str, str, str | None]] = queue.Queue()
+        threading.Thread(target=self._flush_processed, daemon=True, name="slack-processed-writer").start()
+
     def start(self):
         """Start the Slack Bolt app in Socket Mode (blocking — run in a thread)."""
         handler = SocketModeHandler(self.app, self.config.slack_app_token)
@@ -66,7 +119,22 @@ class SlackMonitor:
         # --- Message events (channel monitoring) ---
         @self.app.event("message")
         def handle_message(event, client: WebClient):
-            self._handle_message_event(event, client)
+            # Classify/draft takes seconds; hand it to a worker so Bolt can ack right away
+            try:
+                self._work.put_nowait((event, client))
+            except queue.Full:
+                logger.warning("Slack work queue full — dropping message %s", event.get("ts"))
+
+        # --- Name cache invalidation ---
+        @self.app.event("user_change")
+        def handle_user_change(event):
+            with self._name_lock:
+                self._user_names.pop(event.get("user", {}).get("id"), None)
+
+        @self.app.event("channel_rename")
+        def handle_channel_rename(event):
+            with self._name_lock:
+                self._channel_names.pop(event.get("channel", {}).get("id"), None)
 
         # --- Interactive actions (draft approval flow) ---
         @self.app.action("approve_draft")
@@ -99,8 +167,33 @@ class SlackMonitor:
     # Message monitoring
     # -------------------------------------------------------------------------
 
+    def _process_message_job(self):
+        """Worker loop: handle queued message events one at a time."""
+        while True:
+            event, client = self._work.get()
+            try:
+                self._handle_message_event(event, client)
+            except Exception:
+                logger.exception("Failed to handle Slack message %s", event.get("ts"))
+            finally:
+                self._work.task_done()
+
     def _handle_message_event(self, event: dict, client: WebClient):
         """Handle incoming Slack messages — classify and draft if needed."""
+        # Slack redelivers events on reconnects/retries; a copy arriving while the first
+        # is still being classified would pass is_processed, so claim the ts up front
+        ts = event.get("ts", "")
+        with self._in_flight_lock:
+            if ts in self._in_flight:
+                return
+            self._in_flight.add(ts)
+        try:
+            self._process_message(event, client)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(ts)
+
+    def _process_message(self, event: dict, client: WebClient):
         # Skip bot messages and own messages
         if event.get("bot_id") or event.get("subtype"):
             return
@@ -130,22 +223,12 @@ class SlackMonitor:
         if self.drafts.is_processed(message_ts, "slack"):
             return
 
-        # Get user info for context
-        user_name = None
-        try:
-            user_info = client.users_info(user=event.get("user", ""))
-            user_name = user_info["user"].get("real_name") or user_info["user"].get("name")
-        except Exception:
-            pass
-
-        # Get channel name
-        channel_name = None
-        if not is_dm:
-            try:
-                channel_info = client.conversations_info(channel=channel_id)
-                channel_name = channel_info["channel"].get("name")
-            except Exception:
-                pass
+        # Resolve names (cached — most messages come from familiar people/channels) and
+        # fetch thread context concurrently on the async loop: one round-trip, not three
+        user_name, channel_name, thread_context = asyncio.run_coroutine_threadsafe(
+            self._gather_context(event.get("user", ""), channel_id, is_dm, thread_ts, message_ts),
+            self.classifier.loop,
+        ).result()
 
         message = SlackMessage(
             ts=message_ts,
@@ -158,28 +241,18 @@ class SlackMonitor:
             is_thread_reply=bool(thread_ts),
         )
 
-        # Get thread context if this is a thread reply
-        thread_context = None
-        if thread_ts:
-            try:
-                result = client.conversations_replies(channel=channel_id, ts=thread_ts, limit=10)
-                thread_msgs = result.get("messages", [])
-                # Exclude the current message
-                earlier = [
-                    f"{m.get('user', 'unknown')}: {m.get('text', '')[:300]}"
-                    for m in thread_msgs
-                    if m.get("ts") != message_ts
-                ]
-                if earlier:
-                    thread_context = "\n".join(earlier[-5:])
-            except Exception:
-                pass
-
-        # Classify
-        classification = self.classifier.classify(message, thread_context)
+        # Classify — obvious no-ops are decided here without an LLM round-trip
+        skip_reason = self._skip_reason(event, text, has_mention, thread_context)
+        if skip_reason:
+            classification = SlackClassification(
+                needs_response=False, reason=skip_reason, urgency="low", summary=text[:100]
+            )
+        else:
+            classification = self.classifier.classify(message, thread_context)
 
-        # Mark as processed
-        self.drafts.mark_processed(message_ts, "slack", classification.model_dump_json())
+        # Mark as processed (visible immediately, written to SQLite by the flusher)
+        self.drafts.remember_processed([("slack", message_ts)])
+        self._processed_pending.put((message_ts, "slack", classification.model_dump_json()))
 
         if not classification.needs_response:
             logger.debug("Slack message in %s doesn't need response: %s", channel_name, classification.reason)
@@ -214,10 +287,92 @@ class SlackMonitor:
             summary=classification.summary,
         )
 
+    def _flush_processed(self):
+        """Write-behind loop: batch queued processed markers into one insert + commit."""
+        while True:
+            batch = [self._processed_pending.get()]
+            time.sleep(PROCESSED_FLUSH_SECONDS)  # let a burst accumulate
+            while len(batch) < PROCESSED_FLUSH_BATCH:
+                try:
+                    batch.append(self._processed_pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.drafts.mark_processed_many(batch)
+            except Exception:
+                logger.exception("Failed to record %d processed Slack messages", len(batch))
+
+    def _skip_reason(
+        self, event: dict, text: str, has_mention: bool, thread_context: str | None
+    ) -> str | None:
+        """Why this message clearly needs no response, or None if the classifier should decide."""
+        stripped = text.strip()
+        if len(stripped) < 5 or _ACK_RE.match(stripped):
+            return "Acknowledgement or too short to need a reply"
+        if event.get("user") in self._bot_users:
+            return "Message from a bot user"
+        if not has_mention and thread_context and any(
+            line.startswith(f"{self.config.slack_user_id}:") for line in thread_context.splitlines()
+        ):
+            return "Sarah already replied in this thread"
+        return None
+
+    async def _gather_context(
+        self, user_id: str, channel_id: str, is_dm: bool, thread_ts: str | None, message_ts: str
+    ) -> tuple[str | None, str | None, str | None]:
+        """(user name, channel name, thread context); each is None if unavailable."""
+        return await asyncio.gather(
+            _none_on_error(self._resolve_user_name(user_id)),
+            _none() if is_dm else _none_on_error(self._resolve_channel_name(channel_id)),
+            _none_on_error(self._fetch_thread_context(channel_id, thread_ts, message_ts)) if thread_ts else _none(),
+        )
+
+    async def _fetch_thread_context(self, channel_id: str, thread_ts: str, message_ts: str) -> str | None:
+        """Earlier messages of the thread (up to 5), excluding the current one."""
+        result = await self._aclient.conversations_replies(channel=channel_id, ts=thread_ts, limit=10)
+        earlier = [
+            f"{m.get('user', 'unknown')}: {m.get('text', '')[:300]}"
+            for m in result.get("messages", [])
+            if m.get("ts") != message_ts
+        ]
+        return "\n".join(earlier[-5:]) if earlier else None
+
+    async def _resolve_user_name(self, user_id: str) -> str | None:
+        with self._name_lock:
+            if user_id in self._user_names:
+                return self._user_names[user_id]
+        user = (await self._aclient.users_info(user=user_id))["user"]
+        name = user.get("real_name") or user.get("name")
+        with self._name_lock:
+            self._user_names[user_id] = name
+            if user.get("is_bot"):
+                self._bot_users.add(user_id)
+        return name
+
+    async def _resolve_channel_name(self, channel_id: str) -> str | None:
+        with self._name_lock:
+            if channel_id in self._channel_names:
+                return self._channel_names[channel_id]
+        name = (await self._aclient.conversations_info(channel=channel_id))["channel"].get("name")
+        with self._name_lock:
+            self._channel_names[channel_id] = name
+        return name
+
     # -------------------------------------------------------------------------
     # Interactive handlers (email draft approval flow)
     # -------------------------------------------------------------------------
 
+    def _notification_address(self, draft_id: str, draft: Draft) -> tuple[str, str] | None:
+        """(channel, ts) of the draft's Slack notification. The notifier's in-memory map
+        is checked first: it is set the moment the notification is posted, while the
+        draft row only gets it when the scan that created it commits."""
+        address = self.notifier.notification_address(draft_id)
+        if address:
+            return address
+        if draft.slack_notification_ts and draft.slack_notification_channel:
+            return draft.slack_notification_channel, draft.slack_notification_ts
+        return None
+
     def _handle_approve(self, body: dict, client: WebClient):
         """Handle 'Send' button click — send the email and update notification."""
         draft_id = body["actions"][0]["value"]
@@ -243,18 +398,21 @@ class SlackMonitor:
                 logger.exception("Failed to send email for draft %s", draft_id)
                 return
 
-        self.drafts.update_status(draft_id, DraftStatus.SENT)
+        draft = self.drafts.update_status(draft_id, DraftStatus.SENT)
+        self.drafts.commit()
+        if draft is None:
+            logger.error("Draft %s vanished before it could be marked sent", draft_id)
+            return
 
         # Check if user edited — record for voice learning
         if draft.edited_text:
             self.feedback.record_edit_diff(draft_id, draft.draft_text, draft.edited_text)
+            self.generator.invalidate_caches()
 
         # Update the Slack notification
-        draft = self.drafts.get(draft_id)  # Refresh
-        if draft.slack_notification_ts and draft.slack_notification_channel:
-            self.notifier.update_draft_status(
-                draft.slack_notification_channel, draft.slack_notification_ts, "Sent", draft
-            )
+        address = self._notification_address(draft_id, draft)
+        if address:
+            self.notifier.update_draft_status(*address, "Sent", draft)
 
         logger.info("Draft %s approved and sent", draft_id)
 
@@ -294,25 +452,23 @@ class SlackMonitor:
     def _handle_reject(self, body: dict, client: WebClient):
         """Handle 'Reject' button click."""
         draft_id = body["actions"][0]["value"]
-        self.drafts.update_status(draft_id, DraftStatus.REJECTED)
+        draft = self.drafts.update_status(draft_id, DraftStatus.REJECTED)
+        self.drafts.commit()
 
-        draft = self.drafts.get(draft_id)
-        if draft and draft.slack_notification_ts and draft.slack_notification_channel:
-            self.notifier.update_draft_status(
-                draft.slack_notification_channel, draft.slack_notification_ts, "Rejected", draft
-            )
+        address = self._notification_address(draft_id, draft) if draft else None
+        if address:
+            self.notifier.update_draft_status(*address, "Rejected", draft)
         logger.info("Draft %s rejected", draft_id)
 
     def _handle_skip(self, body: dict, client: WebClient):
         """Handle 'Skip' button click."""
         draft_id = body["actions"][0]["value"]
-        self.drafts.update_status(draft_id, DraftStatus.SKIPPED)
+        draft = self.drafts.update_status(draft_id, DraftStatus.SKIPPED)
+        self.drafts.commit()
 
-        draft = self.drafts.get(draft_id)
-        if draft and draft.slack_notification_ts and draft.slack_notification_channel:
-            self.notifier.update_draft_status(
-                draft.slack_notification_channel, draft.slack_notification_ts, "Skipped", draft
-            )
+        address = self._notification_address(draft_id, draft) if draft else None
+        if address:
+            self.notifier.update_draft_status(*address, "Skipped", draft)
         logger.info("Draft %s skipped", draft_id)
 
     def _handle_edit_submit(self, body: dict, client: WebClient, view: dict):
@@ -320,74 +476,15 @@ class SlackMonitor:
         draft_id = view["private_metadata"]
         edited_text = view["state"]["values"]["draft_input"]["draft_text"]["value"]
 
-        self.drafts.update_edited_text(draft_id, edited_text)
+        draft = self.drafts.update_edited_text(draft_id, edited_text)
+        self.drafts.commit()
 
-        draft = self.drafts.get(draft_id)
         if not draft:
             return
 
-        # Re-send the notification with updated text and buttons
-        # We need to update the existing message to show the edited draft
-        if draft.slack_notification_ts and draft.slack_notification_channel:
-            blocks = [
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": (
-                            f"*Re: {draft.original_subject}*\n"
-                            f"From: {draft.original_from}\n"
-                            f"_{draft.summary}_"
-                        ),
-                    },
-                },
-                {"type": "divider"},
-                {
-                    "type": "context",
-                    "elements": [
-                        {"type": "mrkdwn", "text": "*Edited Draft*"},
-                    ],
-                },
-                {
-                    "type": "section",
-                    "text": {"type": "mrkdwn", "text": edited_text[:2000]},
-                },
-                {"type": "divider"},
-                {
-                    "type": "actions",
-                    "elements": [
-                        {
-                            "type": "button",
-                            "text": {"type": "plain_text", "text": "Send"},
-                            "style": "primary",
-                            "action_id": "approve_draft",
-                            "value": draft.id,
-                        },
-                        {
-                            "type": "button",
-                            "text": {"type": "plain_text", "text": "Edit"},
-                            "action_id": "edit_draft",
-                            "value": draft.id,
-                        },
-                        {
-                            "type": "button",
-                            "text": {"type": "plain_text", "text": "Reject"},
-                            "style": "danger",
-                            "action_id": "reject_draft",
-                            "value": draft.id,
-                        },
-                    ],
-                },
-            ]
-
-            try:
-                client.chat_update(
-                    channel=draft.slack_notification_channel,
-                    ts=draft.slack_notification_ts,
-                    text=f"Edited draft: {draft.original_subject}",
-                    blocks=blocks,
-                )
-            except Exception:
-                logger.exception("Failed to update edited draft notification")
+        # Update the existing notification to show the edited draft
+        address = self._notification_address(draft_id, draft)
+        if address:
+            self.notifier.update_edited_draft(*address, draft, edited_text)
 
         logger.info("Draft %s edited by user", draft_id)
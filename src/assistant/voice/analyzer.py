@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
-import sqlite3
+import re
+import threading
+import time
 
 import anthropic
+import orjson
 
 from assistant.config import Config
+from assistant.db import Database
 from assistant.models import EmailMessage
 from assistant.voice.profile import VoiceProfileManager
 
@@ -48,11 +52,9 @@ Return a JSON object with this structure:
 
 Return ONLY the JSON object, no other text."""
 
-CLASSIFY_RECIPIENT_PROMPT = """Classify the recipient type based on the email context.
-
-From: {from_email}
-To: {to_email}
-Subject: {subject}
+# Static recipient-type definitions go in the (cached) system block; only the
+# per-email fields below vary between requests
+CLASSIFY_RECIPIENT_SYSTEM_PROMPT = """Classify the recipient type based on the email context.
 
 Recipient types:
 - "investor" — VC partner, PE firm, investor relations
@@ -63,112 +65,286 @@ Recipient types:
 
 Return ONLY one word: investor, internal, partner, vendor, or unknown."""
 
+CLASSIFY_RECIPIENT_PROMPT = """From: {from_email}
+To: {to_email}
+Subject: {subject}"""
+
+# Outermost {...} of the model's reply (greedy, so nested objects stay inside)
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+SAMPLE_SEPARATOR = "\n\n===== EMAIL =====\n\n"
+
+RECIPIENT_MODEL = "claude-haiku-4-5-20251001"  # Haiku for cheap classification
+RECIPIENT_TYPES = ("investor", "internal", "partner", "vendor")
+
+# Recipient classification runs as one Message Batches job; results usually
+# arrive within minutes and this is a background job, so waiting is fine
+BATCH_POLL_SECONDS = 10
+BATCH_MAX_WAIT_SECONDS = 1800
+
+# Recipient domains/subjects decided without a model call. Personal mailboxes
+# say nothing about the relationship, so they stay "unknown".
+FREEMAIL_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "yahoo.com", "ymail.com", "hotmail.com", "outlook.com",
+    "live.com", "msn.com", "icloud.com", "me.com", "mac.com", "aol.com", "proton.me",
+    "protonmail.com", "pm.me", "gmx.com", "gmx.net", "mail.com", "zoho.com", "fastmail.com",
+    "hey.com", "yandex.com", "comcast.net", "verizon.net", "att.net",
+})
+INVESTOR_DOMAINS = frozenset({
+    "a16z.com", "sequoiacap.com", "accel.com", "indexventures.com", "greylock.com",
+    "benchmark.com", "kleinerperkins.com", "lsvp.com", "gv.com", "foundersfund.com",
+    "generalcatalyst.com", "bvp.com", "insightpartners.com", "tigerglobal.com",
+    "coatue.com", "ycombinator.com", "firstround.com", "usv.com", "felicis.com",
+    "redpoint.com", "nea.com", "battery.com", "ivp.com", "matrixpartners.com",
+    "khoslaventures.com", "lux.vc", "thrivecap.com", "sparkcapital.com",
+})
+VENDOR_SUBJECT_KEYWORDS = (
+    "invoice", "receipt", "quote", "quotation", "pricing", "renewal", "subscription",
+    "purchase order", "billing", "payment", "contract renewal", "proposal", "demo",
+    "onboarding", "license", "trial",
+)
+_VENDOR_SUBJECT_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, VENDOR_SUBJECT_KEYWORDS)) + r")\b")
+
+# In-flight limit for the concurrent (non-batch) recipient classification path
+RECIPIENT_CONCURRENCY = 10
+
 
 class VoiceAnalyzer:
     """Analyzes sent emails to build a voice profile using Claude."""
 
-    def __init__(self, config: Config, db: sqlite3.Connection):
-        self.client = anthropic.Anthropic(api_key=config.anthropic_api_key)
+    def __init__(self, config: Config, db: Database):
+        self.api_key = config.anthropic_api_key
+        self.client = anthropic.Anthropic(api_key=self.api_key)
         self.model = config.model
         self.profile_manager = VoiceProfileManager(db)
         self.user_email = config.gmail_user_email
+        self._user_domain = self.user_email.rpartition("@")[2].lower() if "@" in self.user_email else ""
+
+    def analyze_emails(
+        self, emails: list[EmailMessage], use_batch: bool = False, stop: threading.Event | None = None
+    ) -> dict:
+        """Analyze a batch of sent emails and create/update the voice profile.
 
-    def analyze_emails(self, emails: list[EmailMessage]) -> dict:
-        """Analyze a batch of sent emails and create/update the voice profile."""
+        The profile call and recipient classification are independent, so they run
+        at the same time. Recipients are classified with concurrent calls by default;
+        use_batch sends them as one Message Batches job instead (half the cost, but
+        it can take minutes), for jobs where nobody is waiting on the result.
+        If `stop` is set by the time the analysis returns, nothing is saved."""
         if not emails:
             logger.warning("No emails to analyze")
             return {}
 
         # Build email samples for analysis
-        samples = []
-        for email in emails[:100]:  # Cap at 100
-            to_str = ", ".join(email.to[:3])
-            body = email.body_snippet[:1000]
-            samples.append(
-                f"To: {to_str}\nSubject: {email.subject}\n---\n{body}"
-            )
-
-        samples_text = "\n\n===== EMAIL =====\n\n".join(samples)
-
-        logger.info("Analyzing %d sent emails for voice profile...", len(samples))
-
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=2000,
-            system=ANALYSIS_SYSTEM_PROMPT,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Analyze these {len(samples)} sent emails:\n\n{samples_text}",
-                }
-            ],
+        sample_emails = emails[:100]  # Cap at 100
+        samples_text = SAMPLE_SEPARATOR.join(
+            f"To: {', '.join(email.to[:3])}\nSubject: {email.subject}\n---\n{email.body_snippet[:1000]}"
+            for email in sample_emails
         )
+        analysis_params = self._analysis_params(samples_text, len(sample_emails))
+
+        # Save top 50 as examples, skipping ones stored by an earlier run
+        examples = [e for e in emails[:50] if not self.profile_manager.has_example(e.message_id)]
+        recipient_types, external = self._heuristic_types(examples)
 
-        response_text = response.content[0].text.strip()
+        logger.info("Analyzing %d sent emails for voice profile...", len(sample_emails))
 
-        # Parse JSON from response (handle markdown code blocks)
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-            response_text = response_text.strip()
+        if use_batch:
+            response_text, claude_types = self._analyze_with_batch(analysis_params, external)
+        else:
+            response_text, claude_types = asyncio.run(self._analyze_concurrently(analysis_params, external))
+        recipient_types.update(claude_types)
+        if stop is not None and stop.is_set():
+            logger.info("Voice analysis stopped before saving")
+            return {}
 
+        # Parse the JSON object, whether or not it is wrapped in a markdown code block
+        match = _JSON_OBJECT_RE.search(response_text)
         try:
-            profile = json.loads(response_text)
-        except json.JSONDecodeError:
+            profile = orjson.loads(match.group(0) if match else response_text)
+        except orjson.JSONDecodeError:
             logger.error("Failed to parse voice profile JSON: %s", response_text[:200])
             return {}
 
         # Save profile
-        self.profile_manager.save_profile(profile, len(samples))
+        self.profile_manager.save_profile(profile, len(sample_emails))
 
         # Save individual examples with recipient classification
-        for email in emails[:50]:  # Save top 50 as examples
-            recipient_type = self._classify_recipient(email)
-            domain = email.to[0].split("@")[1] if email.to else "unknown"
-            self.profile_manager.save_example(
-                email_id=email.message_id,
-                recipient_type=recipient_type,
-                recipient_domain=domain,
-                subject=email.subject,
-                sent_text=email.body_snippet[:1000],
-                tone_tags=[],  # Could be enriched later
+        self.profile_manager.save_examples([
+            (
+                email.message_id,
+                recipient_types.get(email.message_id, "unknown"),
+                email.to[0].rpartition("@")[2] if email.to else "unknown",
+                email.subject,
+                email.body_snippet[:1000],
+                [],  # tone tags — could be enriched later
             )
+            for email in examples
+        ])
 
-        logger.info("Voice profile created from %d emails", len(samples))
+        logger.info("Voice profile created from %d emails", len(sample_emails))
         return profile
 
-    def _classify_recipient(self, email: EmailMessage) -> str:
-        """Classify the recipient type of a sent email."""
-        to_email = email.to[0] if email.to else "unknown"
+    def _analysis_params(self, samples_text: str, sample_count: int) -> dict:
+        return {
+            "model": self.model,
+            "max_tokens": 2000,
+            "system": [
+                {"type": "text", "text": ANALYSIS_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": f"Analyze these {sample_count} sent emails:\n\n{samples_text}",
+                }
+            ],
+        }
 
-        # Quick heuristics before calling Claude
-        user_domain = self.user_email.split("@")[1] if "@" in self.user_email else ""
-        to_domain = to_email.split("@")[1] if "@" in to_email else ""
+    def _heuristic_types(self, emails: list[EmailMessage]) -> tuple[dict[str, str], list[EmailMessage]]:
+        """Decide obvious recipients locally (_heuristic_type). Returns message_id -> type
+        for those, plus the emails Claude still needs to classify."""
+        results = {}
+        external = []
+        for email in emails:
+            recipient_type = self._heuristic_type(email)
+            if recipient_type:
+                results[email.message_id] = recipient_type
+            else:
+                external.append(email)
+        logger.info(
+            "Recipient heuristics decided %d/%d emails, %d need Claude",
+            len(results), len(emails), len(external),
+        )
+        return results, external
+
+    async def _analyze_concurrently(
+        self, analysis_params: dict, emails: list[EmailMessage]
+    ) -> tuple[str, dict[str, str]]:
+        """Run the profile call while recipients are classified with up to
+        RECIPIENT_CONCURRENCY requests in flight. Returns (profile text, message_id -> type)."""
+        async with anthropic.AsyncAnthropic(api_key=self.api_key) as client:
+            profile_task = asyncio.create_task(client.messages.create(**analysis_params))
+            sem = asyncio.Semaphore(RECIPIENT_CONCURRENCY)
+            async with asyncio.TaskGroup() as tg:
+                tasks = [
+                    tg.create_task(self._classify_recipient_async(client, sem, email))
+                    for email in emails
+                ]
+            response = await profile_task
+        types = {email.message_id: task.result() for email, task in zip(emails, tasks)}
+        return response.content[0].text, types
+
+    async def _classify_recipient_async(
+        self, client: anthropic.AsyncAnthropic, sem: asyncio.Semaphore, email: EmailMessage
+    ) -> str:
+        async with sem:
+            try:
+                response = await client.messages.create(**self._recipient_params(email))
+                return _parse_recipient_type(response.content[0].text)
+            except Exception:
+                logger.exception("Failed to classify recipient for %s", email.to[0] if email.to else "unknown")
+                return "unknown"
+
+    def _analyze_with_batch(
+        self, analysis_params: dict, emails: list[EmailMessage]
+    ) -> tuple[str, dict[str, str]]:
+        """Submit the recipient batch, make the profile call while it processes, then
+        collect the batch — falling back to one call per email if it fails."""
+        batch = None
+        if emails:
+            try:
+                batch = self._submit_batch(emails)
+            except Exception:
+                logger.exception("Failed to submit recipient classification batch")
+
+        response = self.client.messages.create(**analysis_params)
+
+        if batch is not None:
+            try:
+                return response.content[0].text, self._collect_batch(batch)
+            except Exception:
+                logger.exception("Recipient classification batch failed, classifying one at a time")
+        types = {email.message_id: self._classify_recipient(email) for email in emails}
+        return response.content[0].text, types
+
+    def _submit_batch(self, emails: list[EmailMessage]):
+        return self.client.messages.batches.create(
+            requests=[
+                {"custom_id": email.message_id, "params": self._recipient_params(email)}
+                for email in emails
+            ]
+        )
+
+    def _collect_batch(self, batch) -> dict[str, str]:
+        """Wait for a submitted Message Batches job. Returns message_id -> type for the
+        requests that succeeded."""
+        deadline = time.monotonic() + BATCH_MAX_WAIT_SECONDS
+        while batch.processing_status != "ended":
+            if time.monotonic() > deadline:
+                self.client.messages.batches.cancel(batch.id)
+                raise TimeoutError(f"Recipient batch {batch.id} did not finish in time")
+            time.sleep(BATCH_POLL_SECONDS)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        types = {}
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                types[entry.custom_id] = _parse_recipient_type(entry.result.message.content[0].text)
+            else:
+                logger.error("Recipient batch request %s %s", entry.custom_id, entry.result.type)
+        return types
+
+    def _heuristic_type(self, email: EmailMessage) -> str | None:
+        """Recipient type from the domain or subject alone, or None if Claude should decide."""
+        to_email = email.to[0] if email.to else ""
+        to_domain = to_email.rpartition("@")[2].lower() if "@" in to_email else ""
 
-        if user_domain and to_domain == user_domain:
+        if self._user_domain and to_domain == self._user_domain:
             return "internal"
+        if to_domain in INVESTOR_DOMAINS:
+            return "investor"
+        if _VENDOR_SUBJECT_RE.search(email.subject.lower()):
+            return "vendor"
+        if to_domain in FREEMAIL_DOMAINS:
+            return "unknown"
+        return None
+
+    def _recipient_params(self, email: EmailMessage) -> dict:
+        """messages.create parameters for one recipient classification (single and batch)."""
+        return {
+            "model": RECIPIENT_MODEL,
+            "max_tokens": 10,
+            "system": [
+                {"type": "text", "text": CLASSIFY_RECIPIENT_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": CLASSIFY_RECIPIENT_PROMPT.format(
+                        from_email=self.user_email,
+                        to_email=email.to[0] if email.to else "unknown",
+                        subject=email.subject,
+                    ),
+                }
+            ],
+        }
+
+    def _classify_recipient(self, email: EmailMessage) -> str:
+        """Classify the recipient type of a sent email."""
+        # Quick heuristics before calling Claude
+        recipient_type = self._heuristic_type(email)
+        if recipient_type:
+            return recipient_type
 
         # Use Claude for external recipients
         try:
-            response = self.client.messages.create(
-                model="claude-haiku-4-5-20251001",  # Use Haiku for cheap classification
-                max_tokens=10,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": CLASSIFY_RECIPIENT_PROMPT.format(
-                            from_email=self.user_email,
-                            to_email=to_email,
-                            subject=email.subject,
-                        ),
-                    }
-                ],
-            )
-            result = response.content[0].text.strip().lower()
-            if result in ("investor", "internal", "partner", "vendor"):
-                return result
+            response = self.client.messages.create(**self._recipient_params(email))
+            return _parse_recipient_type(response.content[0].text)
         except Exception:
-            logger.exception("Failed to classify recipient for %s", to_email)
+            logger.exception("Failed to classify recipient for %s", email.to[0] if email.to else "unknown")
 
         return "unknown"
+
+
+def _parse_recipient_type(text: str) -> str:
+    result = text.strip().lower()
+    return result if result in RECIPIENT_TYPES else "unknown"
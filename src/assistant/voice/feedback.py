@@ -1,58 +1,138 @@
 from __future__ import annotations
 
+import difflib
 import logging
-import sqlite3
-from datetime import datetime
+import queue
+import threading
+import time
+
+import orjson
+
+from assistant.db import Database, utc_now_iso
 
 logger = logging.getLogger(__name__)
 
+# Feedback rows are written behind the caller: a burst is collected for up to
+# FEEDBACK_FLUSH_SECONDS and committed together, at most FEEDBACK_FLUSH_BATCH rows at a time
+FEEDBACK_FLUSH_SECONDS = 0.5
+FEEDBACK_FLUSH_BATCH = 50
+
+# Unchanged lines kept around each edited region of a stored edit diff
+DIFF_CONTEXT_LINES = 2
+
+INSERT_FEEDBACK_SQL = (
+    "INSERT INTO voice_feedback (draft_id, feedback_type, feedback_content, created_at) VALUES (?, ?, ?, ?)"
+)
+
+# Prompt lines are formatted in SQLite; only trimmed edit diffs (stored as JSON
+# hunks) come back raw as `hunks` for _render_edit
+FEEDBACK_SUMMARY_SQL = """
+SELECT
+    CASE feedback_type
+        WHEN 'text_feedback' THEN '- User feedback: ' || feedback_content
+        WHEN 'edit_diff' THEN CASE WHEN substr(feedback_content, 1, 1) != '['
+            THEN '- User edited a draft:' || char(10) || substr(feedback_content, 1, 500) END
+    END AS line,
+    CASE WHEN feedback_type = 'edit_diff' AND substr(feedback_content, 1, 1) = '['
+        THEN feedback_content END AS hunks
+FROM voice_feedback
+ORDER BY created_at DESC
+LIMIT ?
+"""
+
 
 class VoiceFeedbackProcessor:
     """Processes feedback from draft edits and text responses to improve voice."""
 
-    def __init__(self, db: sqlite3.Connection):
+    def __init__(self, db: Database):
         self.db = db
+        self._pending: queue.SimpleQueue[tuple[str | None, str, str, str]] = queue.SimpleQueue()
+        # Rows queued but not yet committed, so flush() can wait for the writer's batch too
+        self._unwritten = 0
+        self._written = threading.Condition()
+        threading.Thread(target=self._run_writer, daemon=True, name="voice-feedback-writer").start()
 
     def record_edit_diff(self, draft_id: str, original_draft: str, edited_text: str):
         """Record the diff between what the agent drafted and what the user actually sent."""
-        if original_draft.strip() == edited_text.strip():
+        # Exact match first; otherwise whitespace-only edits (trailing newlines, a
+        # blank signature gap) aren't real feedback either
+        if original_draft == edited_text or original_draft.strip() == edited_text.strip():
             return  # No change
 
-        diff_content = (
-            f"ORIGINAL DRAFT:\n{original_draft}\n\n"
-            f"USER EDITED TO:\n{edited_text}"
-        )
-        self.db.execute(
-            "INSERT INTO voice_feedback (draft_id, feedback_type, feedback_content, created_at) VALUES (?, ?, ?, ?)",
-            (draft_id, "edit_diff", diff_content, datetime.utcnow().isoformat()),
-        )
-        self.db.commit()
+        diff_content = orjson.dumps(_edit_hunks(original_draft, edited_text)).decode()
+        self._enqueue((draft_id, "edit_diff", diff_content, utc_now_iso()))
         logger.info("Recorded edit diff for draft %s", draft_id)
 
     def record_text_feedback(self, draft_id: str | None, feedback: str):
         """Record text feedback like 'too formal' or 'perfect'."""
-        self.db.execute(
-            "INSERT INTO voice_feedback (draft_id, feedback_type, feedback_content, created_at) VALUES (?, ?, ?, ?)",
-            (draft_id, "text_feedback", feedback, datetime.utcnow().isoformat()),
-        )
-        self.db.commit()
+        self._enqueue((draft_id, "text_feedback", feedback, utc_now_iso()))
         logger.info("Recorded text feedback: %s", feedback[:50])
 
     def get_feedback_summary(self, limit: int = 20) -> str:
         """Get a summary of recent feedback for inclusion in draft prompts."""
-        rows = self.db.execute(
-            "SELECT feedback_type, feedback_content FROM voice_feedback ORDER BY created_at DESC LIMIT ?",
-            (limit,),
-        ).fetchall()
+        self.flush()  # include feedback recorded moments ago
+        lines = []
+        for line, hunks in self.db.execute(FEEDBACK_SUMMARY_SQL, (limit,)):
+            if line is not None:
+                lines.append(line)
+            elif hunks is not None:
+                lines.append(f"- User edited a draft:\n{_render_edit(hunks)[:500]}")
+        return "\n".join(lines)
 
-        if not rows:
-            return ""
+    def flush(self, timeout: float = 5.0):
+        """Write any queued feedback now and wait for the background writer's batch.
+        Called before reading feedback back and on shutdown."""
+        self._write(self._drain([]))
+        with self._written:
+            self._written.wait_for(lambda: self._unwritten == 0, timeout)
 
-        lines = []
-        for row in rows:
-            if row["feedback_type"] == "text_feedback":
-                lines.append(f"- User feedback: {row['feedback_content']}")
-            elif row["feedback_type"] == "edit_diff":
-                lines.append(f"- User edited a draft:\n{row['feedback_content'][:500]}")
+    def _enqueue(self, row: tuple[str | None, str, str, str]):
+        with self._written:
+            self._unwritten += 1
+        self._pending.put(row)
 
-        return "\n".join(lines)
+    def _drain(self, batch: list, limit: int | None = None) -> list:
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_writer(self):
+        """Write-behind loop: batch queued feedback rows into one insert + commit."""
+        while True:
+            batch = [self._pending.get()]
+            time.sleep(FEEDBACK_FLUSH_SECONDS)  # let a burst accumulate
+            self._write(self._drain(batch, FEEDBACK_FLUSH_BATCH))
+
+    def _write(self, batch: list[tuple[str | None, str, str, str]]):
+        if not batch:
+            return
+        try:
+            self.db.executemany(INSERT_FEEDBACK_SQL, batch)
+            self.db.commit()
+        except Exception:
+            logger.exception("Failed to record %d voice feedback rows", len(batch))
+        finally:
+            with self._written:
+                self._unwritten -= len(batch)
+                self._written.notify_all()
+
+
+def _edit_hunks(original: str, edited: str) -> list[list[str]]:
+    """The changed regions of an edit as [original, edited] text pairs, each with
+    DIFF_CONTEXT_LINES of unchanged context — the rest of the draft isn't stored."""
+    a = original.splitlines()
+    b = edited.splitlines()
+    return [
+        ["\n".join(a[group[0][1]:group[-1][2]]), "\n".join(b[group[0][3]:group[-1][4]])]
+        for group in difflib.SequenceMatcher(None, a, b).get_grouped_opcodes(DIFF_CONTEXT_LINES)
+    ]
+
+
+def _render_edit(content: str) -> str:
+    return "\n...\n".join(
+        f"ORIGINAL DRAFT:\n{original}\n\nUSER EDITED TO:\n{edited}"
+        for original, edited in orjson.loads(content)
+    )
@@ -1,26 +1,52 @@
 from __future__ import annotations
 
-import json
 import logging
 import sqlite3
-from datetime import datetime
+from collections.abc import Iterator
+
+import orjson
+
+from assistant.db import Database, utc_now_iso
 
 logger = logging.getLogger(__name__)
 
+EXAMPLE_COLUMNS = "email_id, recipient_type, recipient_domain, subject, sent_text, tone_tags, created_at"
+FEEDBACK_COLUMNS = "draft_id, feedback_type, feedback_content, created_at"
+
+# Stored example email_ids kept in memory so re-analysing the same sent mail skips
+# both the recipient classification and the no-op INSERT OR IGNORE
+EXAMPLE_ID_CACHE_SIZE = 10_000
+
 
 class VoiceProfileManager:
     """Manages the voice profile in SQLite — load, save, update."""
 
-    def __init__(self, db: sqlite3.Connection):
+    def __init__(self, db: Database):
         self.db = db
+        # (updated_at, parsed profile) — the profile only changes in save_profile,
+        # so a matching updated_at means the JSON doesn't need parsing again
+        self._profile_cache: tuple[str, dict] | None = None
+        # Loaded on first use; only ever holds ids known to be stored
+        self._seen_example_ids: set[str] | None = None
 
     def get_profile(self) -> dict | None:
         """Get the current voice profile as a dict."""
         row = self.db.execute(
-            "SELECT profile_json FROM voice_profile ORDER BY updated_at DESC LIMIT 1"
+            "SELECT updated_at FROM voice_profile ORDER BY updated_at DESC LIMIT 1"
+        ).fetchone()
+        if not row:
+            return None
+        cached = self._profile_cache
+        if cached and cached[0] == row["updated_at"]:
+            return cached[1]
+
+        row = self.db.execute(
+            "SELECT profile_json, updated_at FROM voice_profile ORDER BY updated_at DESC LIMIT 1"
         ).fetchone()
         if row and row["profile_json"]:
-            return json.loads(row["profile_json"])
+            profile = orjson.loads(row["profile_json"])
+            self._profile_cache = (row["updated_at"], profile)
+            return profile
         return None
 
     def save_profile(self, profile: dict, email_count: int):
@@ -28,24 +54,24 @@ class VoiceProfileManager:
         self.db.execute(
             """INSERT OR REPLACE INTO voice_profile (id, profile_json, updated_at, email_count_analyzed)
                VALUES (1, ?, ?, ?)""",
-            (json.dumps(profile), datetime.utcnow().isoformat(), email_count),
+            (orjson.dumps(profile).decode(), utc_now_iso(), email_count),
         )
         self.db.commit()
+        self._profile_cache = None
         logger.info("Voice profile saved (%d emails analyzed)", email_count)
 
-    def get_examples(self, recipient_type: str | None = None, limit: int = 5) -> list[dict]:
-        """Get voice examples, optionally filtered by recipient type."""
+    def get_examples(self, recipient_type: str | None = None, limit: int = 5) -> Iterator[sqlite3.Row]:
+        """Get voice examples, optionally filtered by recipient type. Rows are streamed
+        from the cursor (sqlite3.Row supports row["col"]); list() them to keep them."""
         if recipient_type:
-            rows = self.db.execute(
-                "SELECT * FROM voice_examples WHERE recipient_type = ? ORDER BY created_at DESC LIMIT ?",
+            return self.db.execute(
+                f"SELECT {EXAMPLE_COLUMNS} FROM voice_examples WHERE recipient_type = ? ORDER BY created_at DESC LIMIT ?",
                 (recipient_type, limit),
-            ).fetchall()
-        else:
-            rows = self.db.execute(
-                "SELECT * FROM voice_examples ORDER BY created_at DESC LIMIT ?",
-                (limit,),
-            ).fetchall()
-        return [dict(row) for row in rows]
+            )
+        return self.db.execute(
+            f"SELECT {EXAMPLE_COLUMNS} FROM voice_examples ORDER BY created_at DESC LIMIT ?",
+            (limit,),
+        )
 
     def save_example(
         self,
@@ -57,29 +83,49 @@ class VoiceProfileManager:
         tone_tags: list[str],
     ):
         """Save a voice example from a sent email."""
-        self.db.execute(
+        self.save_examples([(email_id, recipient_type, recipient_domain, subject, sent_text, tone_tags)])
+
+    def has_example(self, email_id: str) -> bool:
+        """Whether this email is known to be stored as an example already. A miss may
+        still be stored (past the cache size); INSERT OR IGNORE covers that case."""
+        return email_id in self._example_ids()
+
+    def _example_ids(self) -> set[str]:
+        if self._seen_example_ids is None:
+            rows = self.db.execute(
+                "SELECT email_id FROM voice_examples ORDER BY id DESC LIMIT ?", (EXAMPLE_ID_CACHE_SIZE,)
+            ).fetchall()
+            self._seen_example_ids = {row["email_id"] for row in rows}
+        return self._seen_example_ids
+
+    def save_examples(self, rows: list[tuple[str, str, str, str, str, list[str]]]):
+        """Save several voice examples in one transaction. Each row is
+        (email_id, recipient_type, recipient_domain, subject, sent_text, tone_tags).
+        Rows whose email_id is already stored are skipped."""
+        seen = self._example_ids()
+        rows = [row for row in rows if row[0] not in seen]
+        if not rows:
+            return
+        now = utc_now_iso()
+        self.db.executemany(
             """INSERT OR IGNORE INTO voice_examples
                (email_id, recipient_type, recipient_domain, subject, sent_text, tone_tags, created_at)
                VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (
-                email_id,
-                recipient_type,
-                recipient_domain,
-                subject,
-                sent_text,
-                json.dumps(tone_tags),
-                datetime.utcnow().isoformat(),
-            ),
+            [
+                (email_id, recipient_type, recipient_domain, subject, sent_text, orjson.dumps(tone_tags).decode(), now)
+                for email_id, recipient_type, recipient_domain, subject, sent_text, tone_tags in rows
+            ],
         )
         self.db.commit()
+        if len(seen) < EXAMPLE_ID_CACHE_SIZE:
+            seen.update(row[0] for row in rows)
 
-    def get_recent_feedback(self, limit: int = 20) -> list[dict]:
-        """Get recent voice feedback entries."""
-        rows = self.db.execute(
-            "SELECT * FROM voice_feedback ORDER BY created_at DESC LIMIT ?",
+    def get_recent_feedback(self, limit: int = 20) -> Iterator[sqlite3.Row]:
+        """Get recent voice feedback entries, streamed from the cursor."""
+        return self.db.execute(
+            f"SELECT {FEEDBACK_COLUMNS} FROM voice_feedback ORDER BY created_at DESC LIMIT ?",
             (limit,),
-        ).fetchall()
-        return [dict(row) for row in rows]
+        )
 
     def get_email_count_analyzed(self) -> int:
         """How many emails have been analyzed for the voice profile."""